@@ -40,6 +40,7 @@ class Controller(IController):
         self.heads_up_display_server: Optional[HeadsUpDisplayServer] = None
 
         self.__done: bool = False
+        self.__failed: bool = False
         self.__execution_server: ExecutionServer = exec_server
         self.__information_publisher: InformationPublisher = info_publisher
         self.__logger: logging.Logger = logging.getLogger("CONTROLLER")
@@ -84,6 +85,7 @@ class Controller(IController):
             self.__score_board_writer = None
         elif task is self.__market_events_reader:
             self.__done = True
+            self.__failed = task.error is not None
 
         if self.__match_events_writer is None and self.__score_board_writer is None:
             asyncio.get_running_loop().stop()
@@ -96,7 +98,7 @@ class Controller(IController):
     def on_tick_timer_ticked(self, timer: Timer, now: float, _: int) -> None:
         """Called when it is time to send an order book update and trade ticks."""
         if self.__done:
-            timer.shutdown(now, "match complete")
+            timer.shutdown(now, "market data error" if self.__failed else "match complete")
             return
 
     async def start(self) -> None:
@@ -109,6 +111,7 @@ class Controller(IController):
             await self.heads_up_display_server.start()
 
         self.__market_events_reader.start()
+        self.__market_events_reader.warm_up()
         self.__match_events_writer.start()
         self.__score_board_writer.start()
 
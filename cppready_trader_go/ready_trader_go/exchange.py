@@ -15,6 +15,7 @@
 #     You should have received a copy of the GNU Affero General Public
 #     License along with Ready Trader Go.  If not, see
 #     <https://www.gnu.org/licenses/>.
+import os
 import socket
 
 from .account import AccountFactory
@@ -24,10 +25,10 @@ from .controller import Controller
 from .execution import ExecutionServer
 from .heads_up import HeadsUpDisplayServer
 from .information import InformationPublisher
+from .instruments import InstrumentRegistry
 from .limiter import FrequencyLimiterFactory
-from .market_events import MarketEventsReader
-from .match_events import MatchEvents, MatchEventsWriter
-from .order_book import OrderBook
+from .market_events import MarketEventsReader, market_data_files
+from .match_events import MARKET_ORDER_EVENT_OPERATIONS, MatchEvents, MatchEventsWriter
 from .pubsub import PublisherFactory
 from .score_board import ScoreBoardWriter
 from .timer import Timer
@@ -59,10 +60,28 @@ def __exchange_config_validator(config):
     if any(k not in config for k in ("Engine", "Execution", "Fees", "Information", "Instrument", "Limits", "Traders")):
         raise Exception("A required key is missing from the configuration")
 
-    __validate_object(config, "Engine", ("MarketDataFile", "MarketEventInterval", "MarketOpenDelay", "MatchEventsFile",
-                                         "ScoreBoardFile", "Speed", "TickInterval"),
-                      (str, float, float, str, str, float, float))
+    __validate_object(config, "Engine", ("MarketEventInterval", "MarketOpenDelay", "MatchEventsFile", "ScoreBoardFile",
+                                         "Speed", "TickInterval"),
+                      (float, float, str, str, float, float))
+    market_data_file = config["Engine"].get("MarketDataFile")
+    if type(market_data_file) is list:
+        if not market_data_file or any(type(f) is not str for f in market_data_file):
+            raise Exception("Engine MarketDataFile should be a file name or a JSON array of file names")
+    elif type(market_data_file) is not str:
+        raise Exception("Engine MarketDataFile should be a file name or a JSON array of file names")
+    if type(config["Engine"].get("MarketDataCache", True)) not in (bool, str):
+        raise Exception("Element of inappropriate type in Engine configuration")
+    if type(config["Engine"].get("MarketDataProcess", False)) is not bool:
+        raise Exception("Element of inappropriate type in Engine configuration")
+    if any(type(config["Engine"].get(k, 0.0)) is not float for k in ("StartTime", "EndTime")):
+        raise Exception("Element of inappropriate type in Engine configuration")
+    if not 0.0 <= config["Engine"].get("StartTime", 0.0) < config["Engine"].get("EndTime", float("inf")):
+        raise Exception("Engine StartTime should be non-negative and before EndTime")
+    if config["Engine"].get("MarketOrderEvents", "full") not in MARKET_ORDER_EVENT_OPERATIONS:
+        raise Exception("Engine MarketOrderEvents should be 'full', 'compact' or 'none'")
     __validate_object(config, "Execution", ("Host", "Port"), (str, int))
+    if type(config["Execution"].get("QueuePositionUpdates", False)) is not bool:
+        raise Exception("Element of inappropriate type in Execution configuration")
     __validate_object(config, "Fees", ("Maker", "Taker"), (float, float))
     __validate_object(config, "Information", ("Type", "Name"), (str, str))
     __validate_object(config, "Instrument", ("EtfClamp", "TickSize",), (float, float))
@@ -74,6 +93,24 @@ def __exchange_config_validator(config):
         __validate_object(config, "Hud", ("Host", "Port"), (str, int))
         __validate_hostname(config, "Hud", "Host")
 
+    if "Instruments" in config:
+        instruments = config["Instruments"]
+        if type(instruments) is not list or len(instruments) < 2:
+            raise Exception("Instruments configuration should be a JSON array of at least two objects")
+        for obj in instruments:
+            if type(obj) is not dict or type(obj.get("Name")) is not str or type(obj.get("TickSize")) is not float:
+                raise Exception("Each instrument configuration should be a JSON object with a Name and TickSize")
+            if any(type(obj.get(k, 0.0)) is not float for k in ("Maker", "Taker")):
+                raise Exception("Element of inappropriate type in Instruments configuration")
+        names = [obj["Name"] for obj in instruments]
+        if len(set(names)) != len(names):
+            raise Exception("Instrument names should be unique in Instruments configuration")
+
+    if "OrderBook" in config:
+        __validate_object(config, "OrderBook", ("Type",), (str,))
+        if config["OrderBook"]["Type"] not in ("sorted", "tick"):
+            raise Exception("OrderBook type should be either 'sorted' or 'tick'")
+
     if type(config["Traders"]) is not dict:
         raise Exception("Traders configuration should be a JSON object")
     if any(type(k) is not str for k in config["Traders"]):
@@ -92,25 +129,46 @@ def setup(app: Application) -> Controller:
     instrument = app.config["Instrument"]
     limits = app.config["Limits"]
 
-    future_book = OrderBook(Instrument.FUTURE, 0.0, 0.0)
-    etf_book = OrderBook(Instrument.ETF, app.config["Fees"]["Maker"], app.config["Fees"]["Taker"])
-
-    match_events = MatchEvents()
-    match_events_writer = MatchEventsWriter(match_events, engine["MatchEventsFile"], app.event_loop)
-    market_events_reader = MarketEventsReader(engine["MarketDataFile"], app.event_loop, future_book, etf_book,
-                                              match_events)
+    ladder_type = app.config["OrderBook"]["Type"] if "OrderBook" in app.config else "sorted"
+    instruments = InstrumentRegistry(app.config)
+    order_books = instruments.create_order_books(ladder_type)
+    future_book = order_books[Instrument.FUTURE]
+    etf_book = order_books[Instrument.ETF]
+
+    filenames = market_data_files(engine["MarketDataFile"])
+
+    # MarketDataCache is either a flag or the cache directory, by default each market data file's directory
+    cache_directory = engine.get("MarketDataCache", True)
+    if cache_directory is True:
+        cache_directory = os.curdir  # Relative to the market data file's directory (see compile_market_data)
+    elif cache_directory is False:
+        cache_directory = None
+    else:
+        cache_directory = os.path.abspath(cache_directory)
+
+    market_order_events = engine.get("MarketOrderEvents", "full")
+    match_events = MatchEvents(MARKET_ORDER_EVENT_OPERATIONS[market_order_events])
+    match_events_writer = MatchEventsWriter(match_events, engine["MatchEventsFile"], app.event_loop,
+                                            market_order_events)
+    market_events_reader = MarketEventsReader(filenames, app.event_loop, order_books, match_events,
+                                              cache_directory, engine.get("StartTime", 0.0), engine.get("EndTime"),
+                                              engine.get("MarketDataProcess", False))
     score_board_writer = ScoreBoardWriter(engine["ScoreBoardFile"], app.event_loop)
 
     tick_timer = Timer(engine["TickInterval"], engine["Speed"])
-    account_factory = AccountFactory(instrument["EtfClamp"], instrument["TickSize"])
+    etf_tick_size = (app.config["Instruments"][Instrument.ETF]["TickSize"] if "Instruments" in app.config
+                     else instrument["TickSize"])
+    account_factory = AccountFactory(instrument["EtfClamp"], etf_tick_size)
     unhedged_lots_factory = UnhedgedLotsFactory()
     competitor_manager = CompetitorManager(app.config["Limits"], app.config["Traders"], account_factory, etf_book,
-                                           future_book, match_events, score_board_writer, instrument["TickSize"],
-                                           tick_timer, unhedged_lots_factory)
+                                           future_book, match_events, score_board_writer, tick_timer,
+                                           unhedged_lots_factory,
+                                           exec_.get("QueuePositionUpdates", False))
 
     limiter_factory = FrequencyLimiterFactory(limits["MessageFrequencyInterval"] / engine["Speed"],
                                               limits["MessageFrequencyLimit"])
     exec_server = ExecutionServer(exec_["Host"], exec_["Port"], competitor_manager, limiter_factory)
+    # Only the books of the instruments that competitors trade are published (the others are replay-only)
     info_publisher = InformationPublisher(app.event_loop, PublisherFactory(info["Type"], info["Name"]),
                                           (future_book, etf_book), tick_timer)
 
@@ -18,7 +18,7 @@
 import asyncio
 import logging
 
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 
 from .competitor import CompetitorManager
 from .match_events import MatchEvent, MatchEventOperation, MatchEvents
@@ -124,7 +124,7 @@ class HudConnection(Connection, IExecutionConnection):
         elif event.operation == MatchEventOperation.INSERT:
             INSERT_EVENT_MESSAGE.pack_into(self.__insert_event_message, HEADER_SIZE, event.time,
                                            self.__competitor_ids[event.competitor], event.order_id,
-                                           event.instrument.value, event.side.value, event.volume, event.price,
+                                           event.instrument, event.side.value, event.volume, event.price,
                                            event.lifespan.value)
             self._connection_transport.write(self.__insert_event_message)
         elif event.operation == MatchEventOperation.HEDGE:
@@ -153,10 +153,18 @@ class HudConnection(Connection, IExecutionConnection):
         """Send an order filled message to the heads-up display."""
         # Do nothing since the HUD will get a Trade event.
 
+    def send_order_fills(self, fills: List[Tuple[int, int, int]], statuses: List[Tuple[int, int, int, int]]) -> None:
+        """Send order filled and order status messages to the heads-up display."""
+        # Do nothing since the HUD will get Trade events.
+
     def send_order_status(self, client_order_id: int, fill_volume: int, remaining_volume: int, fees: int) -> None:
         """Send an order status message to the heads-up display."""
         # Do nothing since the HUD will get Trade and cancel events.
 
+    def send_queue_position(self, client_order_id: int, volume_ahead: int) -> None:
+        """Send a queue position message to the heads-up display."""
+        # Do nothing since the HUD does not display queue positions.
+
 
 class HeadsUpDisplayServer:
     def __init__(self, host: str, port: int, match_events: MatchEvents, competitor_manager: CompetitorManager,
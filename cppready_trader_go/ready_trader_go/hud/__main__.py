@@ -23,11 +23,16 @@ import string
 import sys
 import time
 
-from typing import Any, Mapping, Tuple
+from typing import Any, Mapping, Optional, Tuple
 
 from PySide6 import QtGui, QtWidgets
 from PySide6.QtCore import Qt
 
+from ready_trader_go.market_events import MarketEventsReader, market_data_files
+from ready_trader_go.match_events import MatchEvents
+from ready_trader_go.order_book import OrderBook
+from ready_trader_go.types import Instrument
+
 from .event_source import EventSource, LiveEventSource, RecordedEventSource
 from .main_window.main_window import MainWindow
 
@@ -50,6 +55,21 @@ def __create_application() -> QtWidgets.QApplication:
     return app
 
 
+def __create_market_events_reader() -> Optional[MarketEventsReader]:
+    config_path = pathlib.Path(EXCHANGE_CONFIG_PATH)
+    if config_path.exists():
+        with config_path.open("r") as config:
+            config = json.load(config)
+        engine = config.get("Engine", dict()) if type(config) is dict else dict()
+        if engine.get("MarketOrderEvents") == "compact":
+            # The market data may hold more instruments than are displayed (see InstrumentRegistry)
+            instrument_count = len(config["Instruments"]) if "Instruments" in config else len(Instrument)
+            order_books = tuple(OrderBook(i, 0.0, 0.0) for i in range(instrument_count))
+            return MarketEventsReader(market_data_files(engine["MarketDataFile"]), None, order_books, MatchEvents(),
+                                      None, engine.get("StartTime", 0.0), engine.get("EndTime"))
+    return None
+
+
 def __read_exchange_config() -> Tuple[float, float]:
     config_path = pathlib.Path(EXCHANGE_CONFIG_PATH)
     if config_path.exists():
@@ -103,8 +123,10 @@ def replay(path: pathlib.Path):
     splash = __show_splash()
     splash.showMessage("Processing %s..." % str(path), Qt.AlignBottom, QtGui.QColor("#F0F0F0"))
     etf_clamp, tick_size = __read_exchange_config()
+    market_events_reader = __create_market_events_reader()
     with path.open("r", newline="") as csv_file:
-        event_source = RecordedEventSource.from_csv(csv_file, etf_clamp, tick_size)
+        event_source = RecordedEventSource.from_csv(csv_file, etf_clamp, tick_size,
+                                                    market_events_reader=market_events_reader)
     window = __show_main_window(splash, event_source)
     return app.exec_()
 
@@ -24,6 +24,7 @@ from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Set, Te
 from PySide6 import QtCore,  QtNetwork
 
 from ready_trader_go.account import AccountFactory, CompetitorAccount
+from ready_trader_go.market_events import MarketEventsReader, rejoin_market_events
 from ready_trader_go.messages import (AMEND_EVENT_MESSAGE, AMEND_EVENT_MESSAGE_SIZE, CANCEL_EVENT_MESSAGE,
                                       CANCEL_EVENT_MESSAGE_SIZE, ERROR_MESSAGE, ERROR_MESSAGE_SIZE, HEADER_SIZE,
                                       HEDGE_EVENT_MESSAGE, HEDGE_EVENT_MESSAGE_SIZE, INSERT_EVENT_MESSAGE,
@@ -192,6 +193,8 @@ class LiveEventSource(EventSource):
                                 volume: int, price: int, lifespan: int) -> None:
         """Callback when an insert event message is received."""
         self.__now = now
+        if instrument >= len(Instrument):
+            return  # Only the future and the ETF are displayed
         order = Order(order_id, Instrument(instrument), Lifespan(lifespan), Side(side), price, volume)
         self.__orders[competitor_id][order_id] = order
         self.__order_books[instrument].insert(now, order)
@@ -306,13 +309,19 @@ class RecordedEventSource(EventSource):
 
     @staticmethod
     def from_csv(file_object: TextIO, etf_clamp: float, tick_size: float,
-                 parent: Optional[QtCore.QObject] = None):
-        """Create a new RecordedEventSource instance from a CSV file."""
+                 parent: Optional[QtCore.QObject] = None, market_events_reader: Optional[MarketEventsReader] = None):
+        """Create a new RecordedEventSource instance from a CSV file.
+
+        If a market events reader is given, the market events referred to by
+        a compact CSV file are rejoined from its market data.
+        """
         source = RecordedEventSource(etf_clamp, tick_size, parent)
         events = source.__events
 
         reader = csv.reader(file_object)
         next(reader)  # Skip header
+        if market_events_reader is not None:
+            reader = rejoin_market_events(reader, market_events_reader)
 
         accounts: Dict[str, CompetitorAccount] = collections.defaultdict(source._account_factory.create)
         books: Tuple[OrderBook, ...] = tuple(OrderBook(i, 0.0, 0.0) for i in Instrument)
@@ -341,6 +350,9 @@ class RecordedEventSource(EventSource):
 
         now: float = TICK_INTERVAL_SECONDS
         for row in reader:
+            if row[2] == "Market":
+                continue  # Market events that were not rejoined
+
             tm = float(row[0])
 
             if tm > now:
@@ -355,6 +367,8 @@ class RecordedEventSource(EventSource):
                 source.__teams.add(team)
 
             if operation == "Insert":
+                if int(row[4]) >= len(Instrument):
+                    continue  # Only the future and the ETF are displayed
                 order = Order(order_id, Instrument(int(row[4])), Lifespan[row[8]], Side[row[5]],
                               int(row[7]), int(row[6]))
                 books[order.instrument].insert(tm, order)
@@ -363,7 +377,9 @@ class RecordedEventSource(EventSource):
                                                                      order.side, order.volume, order.price,
                                                                      order.lifespan)))
             elif operation == "Amend":
-                order = orders[team][order_id]
+                order = orders[team].get(order_id)
+                if order is None:
+                    continue
                 volume_delta = int(row[6])
                 books[order.instrument].amend(tm, order, order.volume + volume_delta)
                 if order.remaining_volume == 0:
@@ -0,0 +1,79 @@
+# Copyright 2021 Optiver Asia Pacific Pty. Ltd.
+#
+# This file is part of Ready Trader Go.
+#
+#     Ready Trader Go is free software: you can redistribute it and/or
+#     modify it under the terms of the GNU Affero General Public License
+#     as published by the Free Software Foundation, either version 3 of
+#     the License, or (at your option) any later version.
+#
+#     Ready Trader Go is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+#
+#     You should have received a copy of the GNU Affero General Public
+#     License along with Ready Trader Go.  If not, see
+#     <https://www.gnu.org/licenses/>.
+from typing import Any, Dict, Iterator, List
+
+from .order_book import OrderBook
+from .types import Instrument
+
+
+class InstrumentDefinition(object):
+    """The definition of an instrument simulated by the exchange."""
+
+    def __init__(self, instrument_id: int, name: str, tick_size: float, maker_fee: float = 0.0,
+                 taker_fee: float = 0.0):
+        """Initialise a new instance of the InstrumentDefinition class."""
+        self.instrument_id: int = instrument_id
+        self.maker_fee: float = maker_fee
+        self.name: str = name
+        self.taker_fee: float = taker_fee
+        self.tick_size: int = int(tick_size * 100.0)  # convert tick size to cents
+
+
+class InstrumentRegistry(object):
+    """The instruments simulated in a match, indexed by a dense integer id.
+
+    Instruments are read from the optional Instruments section of the
+    exchange configuration, in which an instrument's id is its position in
+    the list. Without that section, the registry holds the future and the
+    ETF. Every instrument's market data is replayed into its own order book,
+    but competitors can only trade instrument one (the ETF) and hedge with
+    instrument zero (the future) and only those two order books are
+    published to the autotraders; the other instruments are for replay only.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        """Initialise a new instance of the InstrumentRegistry class."""
+        self.__instruments: List[InstrumentDefinition] = list()
+
+        if "Instruments" in config:
+            for i, obj in enumerate(config["Instruments"]):
+                self.__instruments.append(InstrumentDefinition(i, obj["Name"], obj["TickSize"],
+                                                               obj.get("Maker", 0.0), obj.get("Taker", 0.0)))
+        else:
+            tick_size = config["Instrument"]["TickSize"]
+            self.__instruments.append(InstrumentDefinition(int(Instrument.FUTURE), Instrument.FUTURE.name,
+                                                           tick_size))
+            self.__instruments.append(InstrumentDefinition(int(Instrument.ETF), Instrument.ETF.name, tick_size,
+                                                           config["Fees"]["Maker"], config["Fees"]["Taker"]))
+
+    def __getitem__(self, instrument_id: int) -> InstrumentDefinition:
+        """Return the definition of the instrument with the given id."""
+        return self.__instruments[instrument_id]
+
+    def __iter__(self) -> Iterator[InstrumentDefinition]:
+        """Return an iterator over the instrument definitions in id order."""
+        return iter(self.__instruments)
+
+    def __len__(self) -> int:
+        """Return the number of instruments."""
+        return len(self.__instruments)
+
+    def create_order_books(self, ladder_type: str = "sorted") -> List[OrderBook]:
+        """Return a new order book for each instrument, indexed by instrument id."""
+        return [OrderBook(i.instrument_id, i.maker_fee, i.taker_fee, ladder_type, i.tick_size)
+                for i in self.__instruments]
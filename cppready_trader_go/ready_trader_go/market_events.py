@@ -16,29 +16,65 @@
 #     License along with Ready Trader Go.  If not, see
 #     <https://www.gnu.org/licenses/>.
 import asyncio
+import bz2
+import collections
 import csv
-import enum
+import glob
+import gzip
+import hashlib
+import io
+import itertools
 import logging
+import lzma
+import math
+import multiprocessing
+import multiprocessing.shared_memory
+import os
 import queue
+import string
+import struct
+import tempfile
 import threading
+import time
 
-from typing import Callable, Dict, List, Optional, TextIO
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple, Union
 
-from .match_events import MatchEvents
-from .order_book import IOrderListener, Order, OrderBook
-from .types import Instrument, Lifespan, Side
+from .match_events import MatchEvent, MatchEventOperation, MatchEvents
+from .order_book import TOP_LEVEL_COUNT, IOrderListener, Order, OrderBook
+from .types import Instrument, Lifespan, MarketEventOperation, Side
 
-MARKET_EVENT_QUEUE_SIZE = 1024
+try:
+    import numpy as np
+    import numpy.lib.format
+except ImportError:
+    np = None
+
+MARKET_EVENT_BLOCK_SIZE = 2048  # Market events are passed from the reader thread in blocks of this size
+MARKET_EVENT_QUEUE_SIZE = 8  # Maximum number of blocks in the queue
+PREFETCH_QUEUE_SIZE = 2  # Maximum number of chunks of the next market data file parsed ahead
+RING_CAPACITY = 1 << 16  # Number of binary market data records in a shared memory ring
+RING_HEADER_SIZE = 64
+RING_POLL_INTERVAL = 0.0005
 INPUT_SCALING = 100
 
+# Binary market data files hold a NumPy array of fixed-width records. A
+# missing side or lifespan is stored as NO_VALUE.
+BINARY_SUFFIX = ".npy"
+BINARY_CHUNK_SIZE = 4096
+CSV_CHUNK_SIZE = 1 << 22  # Number of characters of a CSV file converted to binary records at a time
+CSV_FIELD_COUNT = 8
+CACHE_DIGEST_SIZE = 16
+CACHE_READ_SIZE = 1 << 20
+CACHE_TEMPORARY_AGE = 3600.0  # Seconds since a temporary file in the cache was written before it is abandoned
+DECOMPRESSION_BUFFER_SIZE = 1 << 20
+COMPRESSED_OPENERS = {".bz2": bz2.open, ".gz": gzip.open, ".xz": lzma.open}
+MARKET_DATA_VERSION = 1  # Change this whenever parsing or the binary format changes to invalidate cached files
+NO_VALUE = 2
+MARKET_DATA_DTYPE = (np.dtype([("time", "<f8"), ("instrument", "u1"), ("operation", "u1"), ("order_id", "<u8"),
+                               ("side", "u1"), ("volume", "<i4"), ("price", "<i4"), ("lifespan", "u1")])
+                     if np is not None else None)
 
-class MarketEventOperation(enum.IntEnum):
-    AMEND = 0
-    CANCEL = 1
-    INSERT = 2
-    Amend = AMEND
-    Cancel = CANCEL
-    Insert = INSERT
+SNAPSHOT_HEADER = struct.Struct("!I")  # Length of the following order book snapshot
 
 
 class MarketEvent(object):
@@ -57,27 +93,239 @@ class MarketEvent(object):
         self.price: int = price
         self.lifespan: Optional[Lifespan] = lifespan
 
+    def reset(self, time: float, instrument: Instrument, operation: MarketEventOperation, order_id: int,
+              side: Optional[Side], volume: int, price: int, lifespan: Optional[Lifespan]) -> None:
+        """Reinitialise this market event so that a processed event object can be reused."""
+        self.time = time
+        self.instrument = instrument
+        self.operation = operation
+        self.order_id = order_id
+        self.side = side
+        self.volume = volume
+        self.price = price
+        self.lifespan = lifespan
+
+
+class Prefetcher(object):
+    """An iterator over chunks of market data that are read in a background thread."""
+
+    def __init__(self, chunks: Iterator, size: int = PREFETCH_QUEUE_SIZE):
+        """Initialise a new instance of the Prefetcher class and start reading the chunks."""
+        self.chunks: Iterator = chunks
+        self.error: Optional[Exception] = None
+        self.queue: queue.Queue = queue.Queue(size)
+        self.thread: threading.Thread = threading.Thread(target=self.run, daemon=True, name="prefetch")
+        self.thread.start()
+
+    def __iter__(self) -> Iterator:
+        """Yield the chunks as they become available and then raise any error raised while reading them."""
+        fifo = self.queue
+        chunk = fifo.get()
+        while chunk is not None:
+            yield chunk
+            chunk = fifo.get()
+        if self.error is not None:
+            raise self.error
+
+    def run(self) -> None:
+        """Read the chunks and place them in the queue, followed by None."""
+        try:
+            for chunk in self.chunks:
+                self.queue.put(chunk)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.queue.put(None)
+
+
+class MarketDataRing(object):
+    """A ring of binary market data records in shared memory.
+
+    One process writes records and another reads them. The header holds the
+    number of records written, the number read, the state of the writer and
+    the capacity of the ring. Records are written before the count that
+    makes them visible, and each side polls the other's count when the ring
+    is full or empty.
+    """
+    RUNNING, FINISHED, FAILED = range(3)
+
+    def __init__(self, capacity: int = RING_CAPACITY, name: Optional[str] = None):
+        """Initialise a new instance of the MarketDataRing class, creating a new ring unless a name is given."""
+        if name is None:
+            self.memory = multiprocessing.shared_memory.SharedMemory(
+                create=True, size=RING_HEADER_SIZE + capacity * MARKET_DATA_DTYPE.itemsize)
+        else:
+            self.memory = multiprocessing.shared_memory.SharedMemory(name=name)
+        # written, read, state, capacity
+        self.header: "np.ndarray" = np.ndarray(4, dtype=np.uint64, buffer=self.memory.buf)
+        if name is None:
+            self.header[:] = (0, 0, MarketDataRing.RUNNING, capacity)
+        self.capacity: int = int(self.header[3])
+        self.records: "np.ndarray" = np.ndarray(self.capacity, dtype=MARKET_DATA_DTYPE, buffer=self.memory.buf,
+                                                offset=RING_HEADER_SIZE)
+
+    def __iter__(self) -> Iterator["np.ndarray"]:
+        """Yield chunks of up to BINARY_CHUNK_SIZE records until the writer has finished."""
+        chunk = self.read(BINARY_CHUNK_SIZE)
+        while chunk is not None:
+            yield chunk
+            chunk = self.read(BINARY_CHUNK_SIZE)
+
+    def close(self) -> None:
+        """Release this process's view of the ring."""
+        self.header = self.records = None
+        self.memory.close()
+
+    def finish(self, state: int) -> None:
+        """Record that the writer has finished or failed."""
+        self.header[2] = state
+
+    def read(self, limit: int, writer: Optional[multiprocessing.process.BaseProcess] = None) -> Optional["np.ndarray"]:
+        """Return a copy of up to limit records, waiting until some are available, or None at the end.
+
+        If the writer's process is given, an error is raised if it exits
+        while the ring is empty without recording that it has finished or
+        failed (for example, because it was killed).
+        """
+        header = self.header
+        read = int(header[1])
+        written = int(header[0])
+        while written == read:
+            # The writer's state changes after its last write, so read the state before the count
+            state = header[2]
+            written = int(header[0])
+            if written == read:
+                if state == MarketDataRing.FAILED:
+                    raise RuntimeError("market data process failed")
+                if state == MarketDataRing.FINISHED:
+                    return None
+                if (writer is not None and not writer.is_alive() and header[2] == MarketDataRing.RUNNING
+                        and int(header[0]) == read):
+                    raise RuntimeError("market data process exited with code %s" % writer.exitcode)
+                time.sleep(RING_POLL_INTERVAL)
+                written = int(header[0])
+
+        count = min(written - read, limit)
+        start = read % self.capacity
+        if start + count <= self.capacity:
+            chunk = self.records[start:start + count].copy()
+        else:
+            chunk = np.concatenate((self.records[start:], self.records[:start + count - self.capacity]))
+        header[1] = read + count
+        return chunk
+
+    def write(self, records: "np.ndarray", reader: Optional[multiprocessing.process.BaseProcess] = None) -> None:
+        """Write records to the ring, waiting for the reader whenever the ring is full.
+
+        If the reader's process is given, an error is raised if it exits
+        while the ring is full.
+        """
+        header = self.header
+        written = int(header[0])
+        i = 0
+        while i < len(records):
+            free = self.capacity - (written - int(header[1]))
+            if free == 0:
+                if reader is not None and not reader.is_alive():
+                    raise RuntimeError("market data reader process exited")
+                time.sleep(RING_POLL_INTERVAL)
+                continue
+            start = written % self.capacity
+            count = min(free, len(records) - i, self.capacity - start)
+            self.records[start:start + count] = records[i:i + count]
+            written += count
+            i += count
+            header[0] = written
+
+
+class MarketDataProcess(object):
+    """An iterator over the binary market data records of a file parsed by a child process."""
+
+    def __init__(self, filename: str, cache_directory: Optional[str] = None, capacity: int = RING_CAPACITY):
+        """Initialise a new instance of the MarketDataProcess class and start the child process."""
+        self.ring: Optional[MarketDataRing] = MarketDataRing(capacity)
+        self.process = multiprocessing.get_context("spawn").Process(
+            target=produce_market_data, args=(filename, cache_directory, self.ring.memory.name), daemon=True,
+            name="market_data")
+        try:
+            self.process.start()
+        except BaseException:
+            self.ring.close()
+            self.ring.memory.unlink()
+            self.ring = None
+            raise
+
+    def __del__(self):
+        self.close()
+
+    def __iter__(self) -> Iterator["np.ndarray"]:
+        """Yield chunks of records until the child process has written them all and then close."""
+        try:
+            chunk = self.ring.read(BINARY_CHUNK_SIZE, self.process)
+            while chunk is not None:
+                yield chunk
+                chunk = self.ring.read(BINARY_CHUNK_SIZE, self.process)
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """Stop the child process if it is still writing records and release the ring."""
+        if self.ring is not None:
+            if self.ring.header[2] == MarketDataRing.RUNNING:
+                self.process.terminate()  # The records are no longer wanted
+            self.process.join()
+            self.ring.close()
+            self.ring.memory.unlink()
+            self.ring = None
+
 
 class MarketEventsReader(IOrderListener):
     """A processor of market events read from a file."""
 
-    def __init__(self, filename: str, loop: asyncio.AbstractEventLoop, future_book: OrderBook, etf_book: OrderBook,
-                 match_events: MatchEvents):
+    def __init__(self, filename: Union[str, Sequence[str]], loop: asyncio.AbstractEventLoop,
+                 order_books: Sequence[OrderBook],
+                 match_events: MatchEvents, cache_directory: Optional[str] = None, start_time: float = 0.0,
+                 end_time: Optional[float] = None, child_process: bool = False):
         """Initialise a new instance of the MarketEvents class.
+
+        The order books are indexed by instrument id, which is the value of
+        the instrument column in the market data file. If a cache directory
+        is given, CSV market data is compiled to a binary market data file in
+        that directory the first time it is read (see compile_market_data).
+
+        If a sequence of file names is given, the files are played one after
+        the other (see read_playlist). Only the market events before the end
+        time are read and their times are made relative to the start time,
+        so that the market data from the start time onwards is replayed once
+        the market opens (see warm_up). If child_process is True and numpy is
+        available, market data files are parsed by a child process (see
+        MarketDataProcess).
         """
-        self.etf_book: OrderBook = etf_book
-        self.etf_orders: Dict[int, Order] = dict()
+        self.cache_directory: Optional[str] = cache_directory
+        self.child_process: bool = child_process and np is not None
+        self.end_time: Optional[float] = end_time
+        self.error: Optional[Exception] = None
+        self.start_time: float = start_time
         self.event_loop: asyncio.AbstractEventLoop = loop
-        self.filename: str = filename
-        self.future_book: OrderBook = future_book
-        self.future_orders: Dict[int, Order] = dict()
+        self.filenames: Tuple[str, ...] = (filename,) if isinstance(filename, str) else tuple(filename)
+        self.filename: str = self.filenames[0]
+        self.free_events: Deque[MarketEvent] = collections.deque()
+        self.free_orders: List[Order] = list()
+        self.order_books: Tuple[OrderBook, ...] = tuple(order_books)
+        self.orders: Tuple[Dict[int, Order], ...] = tuple(dict() for _ in self.order_books)
+        self.etf_book: OrderBook = self.order_books[Instrument.ETF]
+        self.etf_orders: Dict[int, Order] = self.orders[Instrument.ETF]
+        self.future_book: OrderBook = self.order_books[Instrument.FUTURE]
+        self.future_orders: Dict[int, Order] = self.orders[Instrument.FUTURE]
         self.logger: logging.Logger = logging.getLogger("MARKET_EVENTS")
         self.match_events: MatchEvents = match_events
         self.queue: queue.Queue = queue.Queue(MARKET_EVENT_QUEUE_SIZE)
+        self.events: Iterator[Optional[MarketEvent]] = self.dequeue_events()
+        self.event_count: int = 0
         self.reader_task: Optional[threading.Thread] = None
 
-        # Prime the event pump with a no-op event
-        self.next_event: Optional[MarketEvent] = MarketEvent(0.0, Instrument.FUTURE, MarketEventOperation.CANCEL, 0,
+        # Prime the event pump with a no-op event that is always due
+        self.next_event: Optional[MarketEvent] = MarketEvent(-math.inf, Instrument.FUTURE, MarketEventOperation.CANCEL, 0,
                                                              Side.BUY, 0, 0, Lifespan.FILL_AND_KILL)
 
         # Allow other objects to get a callback when the reader task is complete
@@ -89,94 +337,672 @@ class MarketEventsReader(IOrderListener):
         """Called when the order is amended."""
         self.match_events.amend(now, "", order.client_order_id, -volume_removed)
         if order.remaining_volume == 0:
-            if order.instrument == Instrument.FUTURE:
-                del self.future_orders[order.client_order_id]
-            elif order.instrument == Instrument.ETF:
-                del self.etf_orders[order.client_order_id]
+            del self.orders[order.instrument][order.client_order_id]
+            self.free_orders.append(order)
 
     def on_order_cancelled(self, now: float, order: Order, volume_removed: int) -> None:
         """Called when the order is cancelled."""
         self.match_events.cancel(now, "", order.client_order_id, -volume_removed)
-        if order.instrument == Instrument.FUTURE and order.client_order_id in self.future_orders:
-            del self.future_orders[order.client_order_id]
-        elif order.instrument == Instrument.ETF and order.client_order_id in self.etf_orders:
-            del self.etf_orders[order.client_order_id]
+        self.orders[order.instrument].pop(order.client_order_id, None)
+        self.free_orders.append(order)
 
     def on_order_placed(self, now: float, order: Order) -> None:
         """Called when a good-for-day order is placed in the order book."""
-        if order.instrument == Instrument.FUTURE:
-            self.future_orders[order.client_order_id] = order
-        elif order.instrument == Instrument.ETF:
-            self.etf_orders[order.client_order_id] = order
+        self.orders[order.instrument][order.client_order_id] = order
 
     def on_order_filled(self, now: float, order: Order, price: int, volume: int, fee: int) -> None:
         """Called when the order is partially or completely filled."""
         if order.remaining_volume == 0:
-            if order.instrument == Instrument.FUTURE and order.client_order_id in self.future_orders:
-                del self.future_orders[order.client_order_id]
-            elif order.instrument == Instrument.ETF and order.client_order_id in self.etf_orders:
-                del self.etf_orders[order.client_order_id]
+            self.orders[order.instrument].pop(order.client_order_id, None)
+            self.free_orders.append(order)
+
+    def on_orders_filled(self, now: float, fills: List[Tuple[Order, int, int, int]]) -> None:
+        """Called once per aggressive order with the fills of market orders."""
+        # An aggressive order may have several fills, but must be released only once
+        for order in dict.fromkeys(order for order, _, _, _ in fills if order.remaining_volume == 0):
+            self.orders[order.instrument].pop(order.client_order_id, None)
+            self.free_orders.append(order)
 
     def on_reader_done(self, num_events: int) -> None:
         """Called when the market data reader thread is done."""
         self.logger.info("reader thread complete after processing %d market events", num_events)
 
-    def process_market_events(self, elapsed_time: float) -> None:
-        """Process market events from the queue."""
-        evt: MarketEvent = self.next_event
+    def batch_events(self, elapsed_time: float, instrument: Instrument,
+                     orders: Dict[int, Order]) -> Iterator[Tuple[float, MarketEventOperation, Order, int]]:
+        """Yield due market events for one instrument as order book batch entries.
 
-        while evt and evt.time < elapsed_time:
-            if evt.instrument == Instrument.FUTURE:
-                orders = self.future_orders
-                book = self.future_book
-            else:
-                orders = self.etf_orders
-                book = self.etf_book
+        Entries are generated lazily, so each event is looked up (and, for
+        inserts, recorded) only after the previous one has been applied to the
+        order book. The run ends at the first event that is not yet due or is
+        for another instrument.
+
+        Orders are released to the free list by the listener callbacks once
+        they are finished, and are only reused by a later insert, after the
+        order book has finished applying the event that released them.
+        """
+        evt: MarketEvent = self.next_event
+        free_events = self.free_events
+        free_orders = self.free_orders
+        count = 0
+        record_inserts = MatchEventOperation.INSERT in self.match_events.market_operations
 
+        while evt and evt.time < elapsed_time and evt.instrument == instrument:
             if evt.operation == MarketEventOperation.INSERT:
-                order = Order(evt.order_id, evt.instrument, evt.lifespan, evt.side, evt.price, evt.volume, self)
-                self.match_events.insert(evt.time, "", order.client_order_id, order.instrument, order.side,
-                                         abs(order.volume), order.price, order.lifespan)
-                book.insert(evt.time, order)
+                if free_orders:
+                    order = free_orders.pop()
+                    order.reset(evt.order_id, evt.instrument, evt.lifespan, evt.side, evt.price, evt.volume, self)
+                else:
+                    order = Order(evt.order_id, evt.instrument, evt.lifespan, evt.side, evt.price, evt.volume, self)
+                if record_inserts:
+                    self.match_events.insert(evt.time, "", order.client_order_id, order.instrument, order.side,
+                                             abs(order.volume), order.price, order.lifespan)
+                yield evt.time, evt.operation, order, evt.volume
             elif evt.order_id in orders:
-                order = orders[evt.order_id]
-                if evt.operation == MarketEventOperation.CANCEL:
-                    book.cancel(evt.time, order)
-                elif evt.volume < 0:
-                    # evt.operation must be MarketEventOperation.AMEND
-                    book.amend(evt.time, order, order.volume + evt.volume)
+                yield evt.time, evt.operation, orders[evt.order_id], evt.volume
+
+            count += 1
+            free_events.append(evt)
+            evt = self.next_event = next(self.events)
+
+        self.event_count += count
 
-            evt = self.queue.get()
+    def dequeue_events(self) -> Iterator[Optional[MarketEvent]]:
+        """Yield the market events from the blocks placed in the queue by the reader thread, followed by None.
+
+        The reader thread ends the queue with None or, if it failed, with the
+        exception that stopped it, which is kept in the error attribute.
+        """
+        fifo = self.queue
+        block = fifo.get()
+        while type(block) is list:
+            yield from block
+            block = fifo.get()
+        self.error = block
+        yield None
+
+    def process_market_events(self, elapsed_time: float) -> None:
+        """Process market events from the queue.
+
+        A market match event recording the number of market events processed
+        so far precedes the match events of each run of market events, and
+        another follows the last run, so that the market events of a run are
+        those between the counts of consecutive market match events. Once
+        the events run out, because they are finished or because the reader
+        thread failed (see the error attribute), the task complete callbacks
+        are called.
+        """
+        evt: MarketEvent = self.next_event
+
+        if evt and evt.time < elapsed_time:
+            self.match_events.market(elapsed_time, self.event_count)
+            while evt and evt.time < elapsed_time:
+                instrument = evt.instrument
+                self.order_books[instrument].apply_batch(self.batch_events(elapsed_time, instrument,
+                                                                           self.orders[instrument]))
+                evt = self.next_event
+            if evt is None:
+                self.match_events.market(elapsed_time, self.event_count)
 
-        self.next_event = evt
         if evt is None:
             for c in self.task_complete:
                 c(self)
 
-    def reader(self, market_data: TextIO) -> None:
-        """Read the market data file and place order events in the queue."""
-        fifo = self.queue
+    def open_events(self) -> Iterator[MarketEvent]:
+        """Open the market data file(s) and return an iterator over the market events."""
+        if self.child_process and multiprocessing.current_process().daemon:
+            self.logger.warning("daemonic processes cannot start a market data process, using a thread instead")
+            self.child_process = False
+        if len(self.filenames) > 1:
+            for filename in self.filenames:
+                open(filename, "rb").close()  # Report a missing file now rather than in the reader thread
+            return self.read_playlist()
+        return self.open_file(self.filename)
+
+    def open_file(self, filename: str, prefetch: bool = False) -> Iterator[MarketEvent]:
+        """Open a market data file and return an iterator over its market events.
+
+        Files with the BINARY_SUFFIX are memory-mapped binary market data
+        files, anything else is read as CSV, which may be compressed (see
+        open_market_data). If numpy is available, CSV files are read in large
+        chunks that are converted a column at a time to binary market data
+        records (see parse_market_data). If prefetch is True, the
+        chunks are read by a background thread as soon as the file is opened.
+        A child process, if used, always starts as soon as the file is opened.
+        """
+        if self.child_process:
+            open(filename, "rb").close()  # Report a missing file now rather than in the reader thread
+            return self.read_records(MarketDataProcess(filename, self.cache_directory))
+
+        background = Prefetcher if prefetch else iter
+        if filename.endswith(BINARY_SUFFIX):
+            if np is None:
+                raise ImportError("binary market data files require the numpy package")
+            return self.read_records(background(load_market_data(filename)))
+        if np is not None and self.cache_directory is not None:
+            open(filename, "rb").close()  # Report a missing file now rather than in the reader thread
+            return self.read_records(background(load_cached_market_data(filename, self.cache_directory)))
+        if np is not None:
+            return self.read_records(background(parse_market_data(open_market_data(filename))))
+        return self.read_events(open_market_data(filename))
+
+    def read_playlist(self) -> Iterator[MarketEvent]:
+        """Yield the market events in each of the market data files in turn.
+
+        Event times continue from the last event of the previous file. While
+        a file is played, the next one is opened and its first chunks are
+        parsed in the background. At the end of each file but the last, the
+        market orders it left in the order books are cancelled so that the
+        next file starts with empty order books (order ids may be reused).
+        """
+        free_events = self.free_events
+        offset = 0.0
+        events = self.open_file(self.filenames[0])
+
+        for i in range(len(self.filenames)):
+            next_events = self.open_file(self.filenames[i + 1], True) if i + 1 < len(self.filenames) else None
+
+            resting: Dict[Tuple[Instrument, int], None] = dict()
+            evt_time = 0.0
+            for evt in events:
+                evt.time = evt_time = evt.time + offset
+                if evt.operation == MarketEventOperation.INSERT:
+                    if evt.lifespan == Lifespan.GOOD_FOR_DAY:
+                        resting[evt.instrument, evt.order_id] = None
+                elif evt.operation == MarketEventOperation.CANCEL:
+                    resting.pop((evt.instrument, evt.order_id), None)
+                yield evt
+
+            if next_events is None:
+                break
+
+            self.logger.info("market data file complete: filename='%s' time=%.6f resting_orders=%d",
+                             self.filenames[i], evt_time, len(resting))
+            for instrument, order_id in resting:
+                args = (evt_time, instrument, MarketEventOperation.CANCEL, order_id, None, 0, 0, None)
+                if free_events:
+                    evt = free_events.pop()
+                    evt.reset(*args)
+                    yield evt
+                else:
+                    yield MarketEvent(*args)
+
+            offset = evt_time
+            events = next_events
+
+    def read_records(self, chunks: Iterable["np.ndarray"]) -> Iterator[MarketEvent]:
+        """Yield the market events in chunks of binary market data records."""
+        free_events = self.free_events
+        instruments = tuple(book.instrument for book in self.order_books)
+        operations = tuple(MarketEventOperation)
+        sides = (Side.SELL, Side.BUY, None)
+        lifespans = (Lifespan.FILL_AND_KILL, Lifespan.GOOD_FOR_DAY, None)
+
+        for chunk in chunks:
+            for tm, instrument, operation, order_id, side, volume, price, lifespan in chunk.tolist():
+                args = (tm, instruments[instrument], operations[operation], order_id, sides[side], volume, price,
+                        lifespans[lifespan])
+                if free_events:
+                    evt = free_events.pop()
+                    evt.reset(*args)
+                    yield evt
+                else:
+                    yield MarketEvent(*args)
+
+    def read_events(self, market_data: TextIO) -> Iterator[MarketEvent]:
+        """Yield the market events in a CSV market data file and then close it."""
+        free_events = self.free_events
+        instruments = tuple(book.instrument for book in self.order_books)
 
         with market_data:
             csv_reader = csv.reader(market_data)
             next(csv_reader)  # Skip header row
             for row in csv_reader:
                 # time, instrument, operation, order_id, side, volume, price, lifespan
-                fifo.put(MarketEvent(float(row[0]), Instrument(int(row[1])), MarketEventOperation[row[2]],
-                                     int(row[3]), Side[row[4]] if row[4] else None,
-                                     int(float(row[5])) if row[5] else 0, int(float(row[6]) * INPUT_SCALING) if row[6] else 0,
-                                     Lifespan[row[7]] if row[7] else None))
+                args = (float(row[0]), instruments[int(row[1])], MarketEventOperation[row[2]], int(row[3]),
+                        Side[row[4]] if row[4] else None, int(float(row[5])) if row[5] else 0,
+                        int(float(row[6]) * INPUT_SCALING) if row[6] else 0, Lifespan[row[7]] if row[7] else None)
+                if free_events:
+                    evt = free_events.pop()
+                    evt.reset(*args)
+                    yield evt
+                else:
+                    yield MarketEvent(*args)
+
+    def rebase_events(self, events: Iterator[MarketEvent]) -> Iterator[MarketEvent]:
+        """Yield the market events before the end time with their times relative to the start time."""
+        start_time = self.start_time
+        end_time = self.end_time if self.end_time is not None else math.inf
+
+        for evt in events:
+            if evt.time >= end_time:
+                break
+            evt.time -= start_time
+            yield evt
+
+    def reader(self, events: Iterator[MarketEvent]) -> None:
+        """Read the market events and place them in the queue in blocks, followed by None or the error."""
+        fifo = self.queue
+        num_events = 0
+
+        if self.start_time or self.end_time is not None:
+            events = self.rebase_events(events)
+
+        try:
+            block = list(itertools.islice(events, MARKET_EVENT_BLOCK_SIZE))
+            while block:
+                fifo.put(block)
+                num_events += len(block)
+                block = list(itertools.islice(events, MARKET_EVENT_BLOCK_SIZE))
+        except Exception as e:
+            self.logger.error("failed to read market data after %d market events: filename='%s'", num_events,
+                              self.filename, exc_info=e)
+            fifo.put(e)
+        else:
             fifo.put(None)
 
-        self.event_loop.call_soon_threadsafe(self.on_reader_done, csv_reader.line_num - 1)
+        self.event_loop.call_soon_threadsafe(self.on_reader_done, num_events)
+
+    def restore(self, data: bytes) -> None:
+        """Restore the order books and the market orders maps from a snapshot."""
+        start = 0
+        for book, orders in zip(self.order_books, self.orders):
+            length, = SNAPSHOT_HEADER.unpack_from(data, start)
+            start += SNAPSHOT_HEADER.size
+            orders.clear()
+            orders.update((o.client_order_id, o) for o in book.restore(data[start:start + length], self))
+            start += length
+        if start != len(data):
+            raise ValueError("market events snapshot does not match the number of order books")
+
+    def snapshot(self) -> bytes:
+        """Return a snapshot of the order books.
+
+        The order books should hold only market orders, i.e. the snapshot
+        should be taken before any competitor has traded.
+        """
+        parts = list()
+        for book in self.order_books:
+            data = book.snapshot()
+            parts.append(SNAPSHOT_HEADER.pack(len(data)))
+            parts.append(data)
+        return b"".join(parts)
 
     def start(self):
         """Start the market events reader thread"""
         try:
-            market_data = open(self.filename)
-        except OSError as e:
+            events = self.open_events()
+        except (OSError, ValueError) as e:
             self.logger.error("failed to open market data file: filename='%s'" % self.filename, exc_info=e)
             raise
         else:
-            self.reader_task = threading.Thread(target=self.reader, args=(market_data,), daemon=True, name="reader")
+            self.reader_task = threading.Thread(target=self.reader, args=(events,), daemon=True, name="reader")
             self.reader_task.start()
+
+    def warm_up(self) -> None:
+        """Apply the market events before the start time to the order books.
+
+        The events are not recorded in the match events. Instead, the market
+        orders resting in the order books afterwards are recorded as inserted
+        at time zero. The order books' trade_occurred callbacks are detached
+        during the warm up and no match events are created for it, so trades
+        made during the warm up are not published.
+        """
+        if not self.start_time:
+            return
+
+        match_events, self.match_events = self.match_events, MatchEvents(frozenset())
+        callbacks = [book.trade_occurred for book in self.order_books]
+        for book in self.order_books:
+            book.trade_occurred = list()
+        try:
+            self.process_market_events(0.0)
+        finally:
+            self.match_events = match_events
+            for book, trade_occurred in zip(self.order_books, callbacks):
+                book.trade_occurred = trade_occurred
+
+        for orders in self.orders:
+            for order in orders.values():
+                match_events.insert(0.0, "", order.client_order_id, order.instrument, order.side,
+                                    order.remaining_volume, order.price, order.lifespan)
+
+        prices, volumes = [0] * TOP_LEVEL_COUNT, [0] * TOP_LEVEL_COUNT
+        for book in self.order_books:
+            book.trade_ticks(prices, volumes, prices, volumes)
+
+        self.logger.info("warm up complete: start_time=%.6f resting_orders=%d", self.start_time,
+                         sum(len(orders) for orders in self.orders))
+
+
+def sample_depth(filename: str, times: Sequence[float], order_books: Optional[Sequence[OrderBook]] = None,
+                 levels: int = TOP_LEVEL_COUNT) -> "np.ndarray":
+    """Replay a market data file offline and sample the depth of each order book at the given times.
+
+    The times must be in ascending order. Each sample reflects all events
+    before its time. The result has the shape (len(times), len(order_books),
+    4, levels) and each sample is laid out as by OrderBook.depth_arrays. By
+    default, new future and ETF order books are used.
+    """
+    if np is None:
+        raise ImportError("depth sampling requires the numpy package")
+    if order_books is None:
+        order_books = (OrderBook(Instrument.FUTURE, 0.0, 0.0), OrderBook(Instrument.ETF, 0.0, 0.0))
+
+    result = np.zeros((len(times), len(order_books), 4, levels), dtype=np.int64)
+    reader = MarketEventsReader(filename, None, order_books, MatchEvents())
+    events = reader.open_events()
+    reader.events = itertools.chain(events, (None,))
+    try:
+        for i, now in enumerate(times):
+            reader.process_market_events(now)
+            for j, book in enumerate(reader.order_books):
+                book.depth_arrays(levels, result[i, j])
+    finally:
+        events.close()
+
+    return result
+
+
+def rejoin_market_events(rows: Iterable[Sequence], reader: MarketEventsReader) -> Iterator[Sequence]:
+    """Yield the rows of a compact match events file with the market-participant rows rejoined.
+
+    The reader must be configured with the market data files, start time
+    and end time of the match; its order books are used only for the warm
+    up. Each market row (see MarketEventsReader.process_market_events) is
+    replaced by a row for each of the market events up to the count in the
+    next market row, laid out as in a full match events file except that
+    amends hold the requested change in volume and that amends and cancels
+    of orders no longer in the order book are kept. The rows between the
+    two market rows, such as the trades made by those market events, are
+    held back until the market event rows have been yielded. If the match
+    did not finish, the market events of its last run are unknown and are
+    left out.
+    """
+    operations = {o: MatchEventOperation[o.name] for o in MarketEventOperation}
+    resting: List[MatchEvent] = list()
+
+    source = reader.open_events()
+    events = reader.rebase_events(source) if reader.start_time or reader.end_time is not None else source
+    reader.events = itertools.chain(events, (None,))
+    try:
+        reader.match_events.event_occurred.append(resting.append)
+        reader.warm_up()
+        reader.match_events.event_occurred.remove(resting.append)
+        reader.process_market_events(0.0)  # Consume the no-op event that primes the event pump
+
+        yield from map(list, resting)
+
+        evt = reader.next_event
+        count = reader.event_count
+        held: Optional[List[Sequence]] = None  # The rows after the last market row
+        for row in rows:
+            if row[2] != "Market":
+                if held is None:
+                    yield row
+                else:
+                    held.append(row)
+                continue
+            index = int(row[3])
+            while count < index:
+                if evt is None:
+                    raise ValueError("match events refer to more market events than there are in the market data")
+                yield list(MatchEvent(evt.time, "", operations[evt.operation], evt.order_id, evt.instrument, evt.side,
+                                      evt.volume, evt.price, evt.lifespan, None))
+                count += 1
+                evt = next(reader.events)
+            if held:
+                yield from held
+            held = list()
+        if held:
+            yield from held
+    finally:
+        source.close()
+
+
+def market_data_files(market_data_file: Union[str, Sequence[str]]) -> List[str]:
+    """Return the market data files named by the MarketDataFile configuration, expanding any glob patterns."""
+    filenames = list()
+    for pattern in [market_data_file] if type(market_data_file) is str else market_data_file:
+        filenames.extend(sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern])
+    if not filenames:
+        raise Exception("No market data files match the MarketDataFile configuration")
+    return filenames
+
+
+def open_market_data(filename: str) -> TextIO:
+    """Open a CSV market data file for reading.
+
+    Files with a suffix in COMPRESSED_OPENERS are decompressed as they are
+    read, through a buffer of DECOMPRESSION_BUFFER_SIZE bytes.
+    """
+    opener = COMPRESSED_OPENERS.get(os.path.splitext(filename)[1])
+    if opener is None:
+        return open(filename)
+    return io.TextIOWrapper(io.BufferedReader(opener(filename, "rb"), DECOMPRESSION_BUFFER_SIZE))
+
+
+def load_market_data(filename: str) -> Iterator["np.ndarray"]:
+    """Yield the binary market data records in a binary market data file in chunks."""
+    market_data = np.load(filename, mmap_mode="r")
+    for i in range(0, len(market_data), BINARY_CHUNK_SIZE):
+        yield market_data[i:i + BINARY_CHUNK_SIZE]
+
+
+def load_cached_market_data(filename: str, cache_directory: str) -> Iterator["np.ndarray"]:
+    """Yield the chunks of binary market data records in the cached copy of a CSV market data file.
+
+    The cached copy is compiled if necessary when the first chunk is
+    requested. If it cannot be written, the CSV file is parsed instead.
+    """
+    try:
+        cached = compile_market_data(filename, cache_directory)
+    except OSError as e:
+        logging.getLogger("MARKET_EVENTS").warning("could not cache market data file '%s': %s", filename, e)
+        yield from parse_market_data(open_market_data(filename))
+    else:
+        yield from load_market_data(cached)
+
+
+def produce_market_data(filename: str, cache_directory: Optional[str], ring_name: str) -> None:
+    """Write the binary market data records of a market data file to a shared memory ring.
+
+    This is the body of the child process started by MarketDataProcess,
+    which stops if its parent process exits without reading the records.
+    """
+    parent = multiprocessing.parent_process()
+    ring = MarketDataRing(name=ring_name)
+    try:
+        if filename.endswith(BINARY_SUFFIX):
+            chunks = load_market_data(filename)
+        elif cache_directory is not None:
+            chunks = load_cached_market_data(filename, cache_directory)
+        else:
+            chunks = parse_market_data(open_market_data(filename))
+        for chunk in chunks:
+            ring.write(chunk, parent)
+    except BaseException:
+        ring.finish(MarketDataRing.FAILED)
+        raise
+    else:
+        ring.finish(MarketDataRing.FINISHED)
+    finally:
+        ring.close()
+
+
+def compile_market_data(filename: str, cache_directory: str) -> str:
+    """Return the name of the cached binary copy of a CSV market data file, compiling it if necessary.
+
+    A relative cache directory is relative to the market data file's
+    directory. Cached files are named after the market data file and the
+    hash of its contents and the MARKET_DATA_VERSION, so a changed file or
+    parser never uses a stale copy. Each file is compiled to a temporary
+    file that is then renamed, so concurrent matches on the same market
+    data only ever load a complete copy. Once a copy is compiled, the
+    copies it supersedes are removed (see remove_stale_market_data).
+    """
+    if np is None:
+        raise ImportError("binary market data files require the numpy package")
+
+    digest = hashlib.blake2b(("%d:%r:" % (MARKET_DATA_VERSION, MARKET_DATA_DTYPE.descr)).encode(),
+                             digest_size=CACHE_DIGEST_SIZE)
+    with open(filename, "rb") as market_data:
+        for data in iter(lambda: market_data.read(CACHE_READ_SIZE), b""):
+            digest.update(data)
+
+    cache_directory = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(filename)), cache_directory))
+    name = os.path.basename(filename)
+    cached = os.path.join(cache_directory, "%s.%s%s" % (name, digest.hexdigest(), BINARY_SUFFIX))
+    if os.path.exists(cached):
+        return cached
+
+    os.makedirs(cache_directory, exist_ok=True)
+    fd, temporary = tempfile.mkstemp(suffix=".tmp", prefix=name + ".", dir=cache_directory)
+    os.close(fd)
+    try:
+        convert_market_data(filename, temporary)
+        # mkstemp creates the file readable only by its owner, so give it the permissions open() would have
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(temporary, 0o666 & ~umask)
+        os.replace(temporary, cached)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+    remove_stale_market_data(cached)
+    return cached
+
+
+def remove_stale_market_data(cached: str) -> None:
+    """Remove the files in a cache directory that a newly compiled copy of a market data file supersedes.
+
+    These are the copies of the same market data file with another hash and
+    any of its temporary files that have not been written to for
+    CACHE_TEMPORARY_AGE seconds, which were left by a compilation that did
+    not finish. Files that another match removes first are ignored.
+    """
+    cache_directory, cached_name = os.path.split(cached)
+    prefix = cached_name[:-(CACHE_DIGEST_SIZE * 2 + len(BINARY_SUFFIX))]  # The market data file name and a dot
+    logger = logging.getLogger("MARKET_EVENTS")
+    now = time.time()
+
+    with os.scandir(cache_directory) as entries:
+        for entry in entries:
+            if not entry.name.startswith(prefix) or entry.name == cached_name:
+                continue
+            digest = entry.name[len(prefix):-len(BINARY_SUFFIX)]
+            try:
+                if entry.name.endswith(".tmp"):
+                    stale = now - entry.stat().st_mtime > CACHE_TEMPORARY_AGE
+                else:
+                    stale = (entry.name.endswith(BINARY_SUFFIX) and len(digest) == CACHE_DIGEST_SIZE * 2
+                             and all(c in string.hexdigits for c in digest))
+                if stale:
+                    os.remove(entry.path)
+                    logger.info("removed stale cached market data file '%s'", entry.path)
+            except FileNotFoundError:
+                pass  # Another match removed it first
+
+
+def convert_market_data(source: str, destination: str) -> int:
+    """Convert a CSV market data file to a binary market data file and return the number of events.
+
+    The records are written a chunk at a time as the CSV file is parsed.
+    """
+    if np is None:
+        raise ImportError("binary market data files require the numpy package")
+
+    return write_market_records(parse_market_data(open_market_data(source)), destination)
+
+
+def write_market_records(chunks: Iterable["np.ndarray"], filename: str) -> int:
+    """Write chunks of binary market data records to a binary market data file and return the number of events.
+
+    The records are written as they arrive after a header for an empty
+    array, which is rewritten last, once the number of records is known
+    (numpy pads the header so that its length does not depend on the shape).
+    """
+    header = np.lib.format.header_data_from_array_1_0(np.empty(0, dtype=MARKET_DATA_DTYPE))
+    count = 0
+    with open(filename, "wb") as market_data:
+        np.lib.format.write_array_header_1_0(market_data, header)
+        offset = market_data.tell()
+        for chunk in chunks:
+            market_data.write(chunk.astype(MARKET_DATA_DTYPE, copy=False).tobytes())
+            count += len(chunk)
+
+        header["shape"] = (count,)
+        market_data.seek(0)
+        np.lib.format.write_array_header_1_0(market_data, header)
+        if market_data.tell() != offset:
+            raise ValueError("the header of %s changed length when its shape was written" % filename)
+
+    return count
+
+
+def __lookup(names: Dict[str, int], column: List[str]) -> "np.ndarray":
+    """Return the values of the names in a column of a CSV file.
+
+    Each name is looked up in Python: building a numpy string array to
+    compare or sort costs more than the lookups do.
+    """
+    return np.fromiter(map(names.__getitem__, column), np.uint8, len(column))
+
+
+def __numbers(column: List[str]) -> "np.ndarray":
+    """Return the numbers in a column of a CSV file, where an empty field is zero."""
+    return np.array([field or "0" for field in column], dtype=np.float64)
+
+
+def split_market_data(market_data: TextIO) -> Iterator[list]:
+    """Yield the columns of a CSV market data file in chunks of rows and then close it.
+
+    The file is read CSV_CHUNK_SIZE characters at a time and each chunk of
+    complete rows is split into eight columns with a single split. The
+    volume and price columns are parsed by numpy (after empty fields are
+    replaced with zero, one field at a time) and scaled to integers as
+    arrays, while the other columns are lists of strings. Fields must not
+    be quoted.
+    """
+    with market_data:
+        market_data.readline()  # Skip header row
+        remainder: Optional[str] = ""
+        while remainder is not None:
+            text = market_data.read(CSV_CHUNK_SIZE)
+            if text:
+                text = remainder + text
+                end = text.rfind("\n") + 1
+                text, remainder = text[:end].rstrip("\n"), text[end:]
+            else:
+                text, remainder = remainder.rstrip("\n"), None
+            if not text:
+                continue
+
+            # time, instrument, operation, order_id, side, volume, price, lifespan
+            fields = text.replace("\n", ",").split(",")
+            if len(fields) % CSV_FIELD_COUNT != 0:
+                raise ValueError("each row of market data should have %d fields" % CSV_FIELD_COUNT)
+            columns = [fields[i::CSV_FIELD_COUNT] for i in range(CSV_FIELD_COUNT)]
+            columns[5] = __numbers(columns[5]).astype(np.int64)
+            columns[6] = (__numbers(columns[6]) * INPUT_SCALING).astype(np.int64)
+            yield columns
+
+
+def parse_market_data(market_data: TextIO) -> Iterator["np.ndarray"]:
+    """Yield the market events in a CSV market data file as chunks of binary market data records."""
+    operations = {name: value.value for name, value in MarketEventOperation.__members__.items()}
+    sides = {name: value.value for name, value in Side.__members__.items()}
+    lifespans = {name: value.value for name, value in Lifespan.__members__.items()}
+    sides[""] = lifespans[""] = NO_VALUE
+
+    for columns in split_market_data(market_data):
+        records = np.empty(len(columns[0]), dtype=MARKET_DATA_DTYPE)
+        records["time"] = np.array(columns[0], dtype=np.float64)
+        records["instrument"] = np.array(columns[1], dtype=np.int64)
+        records["operation"] = __lookup(operations, columns[2])
+        records["order_id"] = np.array(columns[3], dtype=np.uint64)
+        records["side"] = __lookup(sides, columns[4])
+        records["volume"] = columns[5]
+        records["price"] = columns[6]
+        records["lifespan"] = __lookup(lifespans, columns[7])
+        yield records
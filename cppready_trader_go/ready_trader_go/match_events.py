@@ -22,7 +22,7 @@ import logging
 import queue
 import threading
 
-from typing import Any, Callable, List, Optional, TextIO, Union
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, TextIO, Union
 
 from .types import Instrument, Lifespan, Side
 
@@ -33,6 +33,23 @@ class MatchEventOperation(enum.IntEnum):
     INSERT = 2
     HEDGE = 3
     TRADE = 4
+    MARKET = 5
+
+
+# The operations of the market-participant events (whose competitor is "")
+# that are written to the match events file in each mode. In "compact" mode,
+# each run of market events is written as a single market event that holds
+# the number of market events processed so far (see rejoin_market_events
+# in the market_events module).
+MARKET_ORDER_EVENT_OPERATIONS: Dict[str, FrozenSet[MatchEventOperation]] = {
+    "full": frozenset((MatchEventOperation.AMEND, MatchEventOperation.CANCEL, MatchEventOperation.INSERT)),
+    "compact": frozenset((MatchEventOperation.MARKET,)),
+    "none": frozenset(),
+}
+
+# The operations of every market-participant event
+ALL_MARKET_EVENT_OPERATIONS: FrozenSet[MatchEventOperation] = frozenset((
+    MatchEventOperation.AMEND, MatchEventOperation.CANCEL, MatchEventOperation.INSERT, MatchEventOperation.MARKET))
 
 
 class MatchEvent:
@@ -60,7 +77,7 @@ class MatchEvent:
                      self.competitor,
                      MatchEvent.OPERATION_NAMES[self.operation],
                      self.order_id,
-                     self.instrument.value if self.instrument is not None else None,
+                     int(self.instrument) if self.instrument is not None else None,
                      "AB"[self.side.value] if self.side is not None else None,
                      self.volume,
                      self.price if self.price is not None else None,
@@ -71,25 +88,42 @@ class MatchEvent:
 class MatchEvents:
     """A clearing house of match events."""
 
-    def __init__(self):
-        """Initialise a new instance of the MatchEvents class."""
+    def __init__(self, market_operations: FrozenSet[MatchEventOperation] = ALL_MARKET_EVENT_OPERATIONS):
+        """Initialise a new instance of the MatchEvents class.
+
+        Market-participant events (whose name is "") are only created for
+        the given market operations; the others are skipped.
+        """
         self.logger = logging.getLogger("MATCH_EVENTS")
+        self.market_operations: FrozenSet[MatchEventOperation] = market_operations
 
         # Callbacks
         self.event_occurred: List[Callable[[MatchEvent], None]] = list()
 
     def amend(self, now: float, name: str, order_id: int, diff: int) -> None:
         """Create a new amend event."""
+        if not name and MatchEventOperation.AMEND not in self.market_operations:
+            return
         event = MatchEvent(now, name, MatchEventOperation.AMEND, order_id, None, None, diff, None, None, None)
         for callback in self.event_occurred:
             callback(event)
 
     def cancel(self, now: float, name: str, order_id: int, diff: int) -> None:
         """Create a new cancel event."""
+        if not name and MatchEventOperation.CANCEL not in self.market_operations:
+            return
         event = MatchEvent(now, name, MatchEventOperation.CANCEL, order_id, None, None, diff, None, None, None)
         for callback in self.event_occurred:
             callback(event)
 
+    def market(self, now: float, event_count: int) -> None:
+        """Create a new market event recording the number of market events processed before a run of them."""
+        if MatchEventOperation.MARKET not in self.market_operations:
+            return
+        event = MatchEvent(now, "", MatchEventOperation.MARKET, event_count, None, None, 0, None, None, None)
+        for callback in self.event_occurred:
+            callback(event)
+
     def fill(self, now: float, name: str, order_id: int, instrument: Instrument, side: Side, price: int, diff: int,
              fee: int) -> None:
         """Create a new fill event."""
@@ -107,6 +141,8 @@ class MatchEvents:
     def insert(self, now: float, name: str, order_id: int, instrument: Instrument, side: Side, volume: int,
                price: int, lifespan: Lifespan) -> None:
         """Create a new insert event."""
+        if not name and MatchEventOperation.INSERT not in self.market_operations:
+            return
         event = MatchEvent(now, name, MatchEventOperation.INSERT, order_id, instrument, side, volume, price,
                            lifespan, None)
         for callback in self.event_occurred:
@@ -116,17 +152,24 @@ class MatchEvents:
 class MatchEventsWriter:
     """A processor of match events that it writes to a file."""
 
-    def __init__(self, match_events: MatchEvents, filename: str, loop: asyncio.AbstractEventLoop):
-        """Initialise a new instance of the MatchEvents class."""
+    def __init__(self, match_events: MatchEvents, filename: str, loop: asyncio.AbstractEventLoop,
+                 market_orders: str = "full"):
+        """Initialise a new instance of the MatchEvents class.
+
+        The market_orders mode is one of the keys of
+        MARKET_ORDER_EVENT_OPERATIONS and controls how the events of market
+        participants are written.
+        """
         self.event_loop: asyncio.AbstractEventLoop = loop
         self.filename: str = filename
         self.finished: bool = False
         self.logger = logging.getLogger("MATCH_EVENTS")
+        self.market_operations: FrozenSet[MatchEventOperation] = MARKET_ORDER_EVENT_OPERATIONS[market_orders]
         self.match_events: MatchEvents = match_events
         self.queue: queue.Queue = queue.Queue()
         self.writer_task: Optional[threading.Thread] = None
 
-        match_events.event_occurred.append(self.queue.put)
+        match_events.event_occurred.append(self.on_match_event)
 
         # Callbacks
         self.task_complete: List[Callable[[Any], None]] = list()
@@ -139,10 +182,15 @@ class MatchEventsWriter:
 
     def finish(self) -> None:
         """Indicate the the series of events is complete."""
-        self.match_events.event_occurred.remove(self.queue.put)
+        self.match_events.event_occurred.remove(self.on_match_event)
         self.queue.put(None)
         self.finished = True
 
+    def on_match_event(self, event: MatchEvent) -> None:
+        """Called when a match event occurs."""
+        if event.competitor or event.operation in self.market_operations:
+            self.queue.put(event)
+
     def on_writer_done(self, num_events: int) -> None:
         """Called when the match event writer thread is done."""
         for c in self.task_complete:
@@ -17,6 +17,8 @@
 #     <https://www.gnu.org/licenses/>.
 import enum
 
+from typing import List, Tuple
+
 
 class Instrument(enum.IntEnum):
     FUTURE = 0
@@ -43,6 +45,15 @@ class Lifespan(enum.IntEnum):
     G = GOOD_FOR_DAY
 
 
+class MarketEventOperation(enum.IntEnum):
+    AMEND = 0
+    CANCEL = 1
+    INSERT = 2
+    Amend = AMEND
+    Cancel = CANCEL
+    Insert = INSERT
+
+
 class ICompetitor:
     def disconnect(self, now: float) -> None:
         """Disconnect this competitor."""
@@ -88,6 +99,14 @@ class IExecutionConnection:
         """Send an order filled message to the auto-trader."""
         raise NotImplementedError()
 
+    def send_order_fills(self, fills: List[Tuple[int, int, int]], statuses: List[Tuple[int, int, int, int]]) -> None:
+        """Send order filled messages followed by order status messages to the auto-trader."""
+        raise NotImplementedError()
+
     def send_order_status(self, client_order_id: int, fill_volume: int, remaining_volume: int, fees: int) -> None:
         """Send an order status message to the auto-trader."""
         raise NotImplementedError()
+
+    def send_queue_position(self, client_order_id: int, volume_ahead: int) -> None:
+        """Send a queue position message to the auto-trader."""
+        raise NotImplementedError()
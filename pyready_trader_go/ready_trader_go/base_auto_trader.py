@@ -25,9 +25,9 @@ from .messages import (AMEND_MESSAGE, AMEND_MESSAGE_SIZE, CANCEL_MESSAGE, CANCEL
                        HEDGE_FILLED_MESSAGE, HEDGE_FILLED_MESSAGE_SIZE, INSERT_MESSAGE, INSERT_MESSAGE_SIZE,
                        LOGIN_MESSAGE, LOGIN_MESSAGE_SIZE, ORDER_BOOK_HEADER, ORDER_BOOK_HEADER_SIZE,
                        ORDER_BOOK_MESSAGE_SIZE, BOOK_PART, ORDER_FILLED_MESSAGE, ORDER_FILLED_MESSAGE_SIZE,
-                       ORDER_STATUS_MESSAGE, ORDER_STATUS_MESSAGE_SIZE, TRADE_TICKS_HEADER,
-                       TRADE_TICKS_HEADER_SIZE, TRADE_TICKS_MESSAGE_SIZE, TICKS_PART,
-                       Connection, MessageType, Subscription)
+                       ORDER_STATUS_MESSAGE, ORDER_STATUS_MESSAGE_SIZE, QUEUE_POSITION_MESSAGE,
+                       QUEUE_POSITION_MESSAGE_SIZE, TRADE_TICKS_HEADER, TRADE_TICKS_HEADER_SIZE,
+                       TRADE_TICKS_MESSAGE_SIZE, TICKS_PART, Connection, MessageType, Subscription)
 from .types import Lifespan, Side
 
 
@@ -93,6 +93,8 @@ class BaseAutoTrader(Connection, Subscription):
             self.on_order_filled_message(*ORDER_FILLED_MESSAGE.unpack_from(data, start))
         elif typ == MessageType.ORDER_STATUS and length == ORDER_STATUS_MESSAGE_SIZE:
             self.on_order_status_message(*ORDER_STATUS_MESSAGE.unpack_from(data, start))
+        elif typ == MessageType.QUEUE_POSITION and length == QUEUE_POSITION_MESSAGE_SIZE:
+            self.on_queue_position_message(*QUEUE_POSITION_MESSAGE.unpack_from(data, start))
         else:
             self.logger.error("received invalid execution message: length=%d type=%d", length, typ)
             self.event_loop.stop()
@@ -131,6 +133,15 @@ class BaseAutoTrader(Connection, Subscription):
         Remaining volume will be set to zero if the order is cancelled.
         """
 
+    def on_queue_position_message(self, client_order_id: int, volume_ahead: int) -> None:
+        """Called when the queue position of one of your resting orders changes.
+
+        The volume_ahead is the number of lots resting ahead of your order at
+        the same price. These messages are only sent when the exchange has
+        queue position updates enabled and at most once per order on each
+        timer tick.
+        """
+
     def on_trade_ticks_message(self, instrument: int, sequence_number: int, ask_prices: List[int],
                                ask_volumes: List[int], bid_prices: List[int], bid_volumes: List[int]) -> None:
         """Called when there is trading activity on the market.
@@ -18,7 +18,7 @@
 import bisect
 import logging
 
-from typing import Any, Callable, Dict, Iterable, List, Optional
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
 from .account import AccountFactory, CompetitorAccount
 from .match_events import MatchEvents
@@ -34,8 +34,9 @@ class Competitor(ICompetitor, IOrderListener):
 
     def __init__(self, name: str, exec_channel: IExecutionConnection, etf_book: OrderBook, future_book: OrderBook,
                  account: CompetitorAccount, match_events: MatchEvents, score_board: ScoreBoardWriter,
-                 position_limit: int, order_count_limit: int, active_volume_limit: int, tick_size: float,
-                 unhedged_lots_factory: UnhedgedLotsFactory, controller: IController):
+                 position_limit: int, order_count_limit: int, active_volume_limit: int,
+                 unhedged_lots_factory: UnhedgedLotsFactory, controller: IController,
+                 queue_position_updates: bool = False):
         """Initialise a new instance of the Competitor class."""
         self.account: CompetitorAccount = account
         self.active_volume: int = 0
@@ -52,10 +53,11 @@ class Competitor(ICompetitor, IOrderListener):
         self.name: str = name
         self.orders: Dict[int, Order] = dict()
         self.position_limit: int = position_limit
+        self.queue_position_updates: bool = queue_position_updates
+        self.queue_positions: Dict[int, int] = dict()
         self.score_board: ScoreBoardWriter = score_board
         self.sell_prices: List[int] = list()
         self.status: str = "OK"
-        self.tick_size: int = int(tick_size * 100.0)  # convert tick size to cents
         self.unhedged_etf_lots: UnhedgedLots = unhedged_lots_factory.create(self.on_unhedged_lots_expiry)
 
     def disconnect(self, now: float) -> None:
@@ -120,29 +122,46 @@ class Competitor(ICompetitor, IOrderListener):
 
     def on_order_filled(self, now: float, order: Order, price: int, volume: int, fee: int) -> None:
         """Called when an order is partially or completely filled."""
-        self.active_volume -= volume
+        self.on_orders_filled(now, [(order, price, volume, fee)])
 
-        if order.remaining_volume == 0:
-            del self.orders[order.client_order_id]
-            if order.side == Side.BUY:
-                self.buy_prices.pop()
-            else:
-                self.sell_prices.pop()
-
-        self.unhedged_etf_lots.apply_position_delta(volume if order.side == Side.BUY else -volume)
-
-        self.match_events.fill(now, self.name, order.client_order_id, order.instrument, order.side, price, volume, fee)
+    def on_orders_filled(self, now: float, fills: List[Tuple[Order, int, int, int]]) -> None:
+        """Called once per aggressive order with all the fills of this competitor's orders."""
+        account = self.account
+        breach_order_id: Optional[int] = None
+        filled_orders: Dict[int, Order] = dict()
         last_traded: int = self.future_book.last_traded_price() or round(self.future_book.midpoint_price())
-        self.account.transact(Instrument.ETF, order.side, price, volume, fee)
-        self.account.update(last_traded, price)
+        position_delta: int = 0
+
+        # Update the account after each fill, so that every intermediate profit and drawdown is seen
+        for order, price, volume, fee in fills:
+            self.active_volume -= volume
+            position_delta += volume if order.side == Side.BUY else -volume
+            filled_orders[order.client_order_id] = order
+            self.match_events.fill(now, self.name, order.client_order_id, order.instrument, order.side, price, volume,
+                                   fee)
+            account.transact(Instrument.ETF, order.side, price, volume, fee)
+            account.update(last_traded, price)
+            if breach_order_id is None and not (-self.position_limit <= account.etf_position <= self.position_limit):
+                breach_order_id = order.client_order_id
+
+        for order in filled_orders.values():
+            if order.remaining_volume == 0:
+                del self.orders[order.client_order_id]
+                if order.side == Side.BUY:
+                    self.buy_prices.pop()
+                else:
+                    self.sell_prices.pop()
+
+        self.unhedged_etf_lots.apply_position_delta(position_delta)
 
         if self.exec_connection is not None:
-            self.exec_connection.send_order_filled(order.client_order_id, price, volume)
-            self.exec_connection.send_order_status(order.client_order_id, order.volume - order.remaining_volume,
-                                                   order.remaining_volume, order.total_fees)
+            self.exec_connection.send_order_fills([(o.client_order_id, p, v) for o, p, v, _ in fills],
+                                                  [(o.client_order_id, o.volume - o.remaining_volume,
+                                                    o.remaining_volume, o.total_fees)
+                                                   for o in filled_orders.values()])
 
-        if not (-self.position_limit <= self.account.etf_position <= self.position_limit):
-            self.hard_breach(now, order.client_order_id, b"ETF position limit breached")
+        if breach_order_id is not None:
+            self.hard_breach(now, breach_order_id, b"ETF position limit breached")
 
     def on_unhedged_lots_expiry(self):
         """Called when unhedged lots have been held for too long."""
@@ -192,7 +211,7 @@ class Competitor(ICompetitor, IOrderListener):
             self.send_error(now, client_order_id, b"%d is not a valid price" % price)
             return
 
-        if price % self.tick_size != 0:
+        if price % self.future_book.tick_size != 0:
             self.send_error(now, client_order_id, b"price is not a multiple of tick size")
             return
 
@@ -256,7 +275,7 @@ class Competitor(ICompetitor, IOrderListener):
             self.send_error(now, client_order_id, b"%d is not a valid price" % price)
             return
 
-        if price % self.tick_size != 0:
+        if price % self.etf_book.tick_size != 0:
             self.send_error(now, client_order_id, b"price is not a multiple of tick size")
             return
 
@@ -296,6 +315,20 @@ class Competitor(ICompetitor, IOrderListener):
         """Called on each timer tick to update the auto-trader."""
         self.account.update(future_price or 0, etf_price or 0)
         self.score_board.tick(now, self.name, self.account, etf_price, future_price, self.status)
+        if self.queue_position_updates and self.exec_connection is not None:
+            self.send_queue_positions()
+
+    def send_queue_positions(self) -> None:
+        """Send the queue position of each resting order whose position has changed since the last update."""
+        previous: Dict[int, int] = self.queue_positions
+        current: Dict[int, int] = dict()
+        for client_order_id, order in self.orders.items():
+            volume_ahead: Optional[int] = self.etf_book.queue_position(order)
+            if volume_ahead is not None:
+                current[client_order_id] = volume_ahead
+                if previous.get(client_order_id) != volume_ahead:
+                    self.exec_connection.send_queue_position(client_order_id, volume_ahead)
+        self.queue_positions = current
 
     def send_error(self, now: float, client_order_id: int, message: bytes) -> None:
         """Send an error message to the auto-trader and shut down the match."""
@@ -315,8 +348,8 @@ class CompetitorManager:
 
     def __init__(self, limits_config: Dict[str, Any], traders_config: Dict[str, str], account_factory: AccountFactory,
                  etf_book: OrderBook, future_book: OrderBook, match_events: MatchEvents,
-                 score_board_writer: ScoreBoardWriter, tick_size: float, timer: Timer,
-                 unhedged_lots_factory: UnhedgedLotsFactory):
+                 score_board_writer: ScoreBoardWriter, timer: Timer,
+                 unhedged_lots_factory: UnhedgedLotsFactory, queue_position_updates: bool = False):
         """Initialise a new instance of the CompetitorManager class."""
         self.__account_factory: AccountFactory = account_factory
         self.__active_volume_limit: int = limits_config["ActiveVolumeLimit"]
@@ -327,11 +360,11 @@ class CompetitorManager:
         self.__match_events: MatchEvents = match_events
         self.__order_count_limit: int = limits_config["ActiveOrderCountLimit"]
         self.__position_limit: int = limits_config["PositionLimit"]
+        self.__queue_position_updates: bool = queue_position_updates
         self.__score_board_writer: ScoreBoardWriter = score_board_writer
         self.__start_time: float = 0.0
         self.__traders: Dict[str, str] = traders_config
         self.__unhedged_lots_factory: UnhedgedLotsFactory = unhedged_lots_factory
-        self.__tick_size: float = tick_size
 
         self.active_competitor_count: int = 0
         self.controller: Optional[IController] = None
@@ -353,7 +386,8 @@ class CompetitorManager:
         competitor = Competitor(name, exec_channel, self.__etf_book, self.__future_book,
                                 self.__account_factory.create(), self.__match_events, self.__score_board_writer,
                                 self.__position_limit, self.__order_count_limit, self.__active_volume_limit,
-                                self.__tick_size, self.__unhedged_lots_factory, self.controller)
+                                self.__unhedged_lots_factory, self.controller,
+                                self.__queue_position_updates)
         self.__competitors[name] = competitor
 
         if self.__start_time != 0.0:
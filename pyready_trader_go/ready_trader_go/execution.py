@@ -18,7 +18,7 @@
 import asyncio
 import logging
 
-from typing import Optional
+from typing import List, Optional, Tuple
 
 from .competitor import Competitor, CompetitorManager
 from .limiter import FrequencyLimiter, FrequencyLimiterFactory
@@ -27,7 +27,7 @@ from .messages import (AMEND_MESSAGE, AMEND_MESSAGE_SIZE, CANCEL_MESSAGE, CANCEL
                        HEDGE_FILLED_MESSAGE_SIZE, HEDGE_MESSAGE, HEDGE_MESSAGE_SIZE, INSERT_MESSAGE,
                        INSERT_MESSAGE_SIZE, LOGIN_MESSAGE, LOGIN_MESSAGE_SIZE, ORDER_FILLED_MESSAGE,
                        ORDER_FILLED_MESSAGE_SIZE, ORDER_STATUS_MESSAGE, ORDER_STATUS_MESSAGE_SIZE,
-                       Connection, MessageType)
+                       QUEUE_POSITION_MESSAGE, QUEUE_POSITION_MESSAGE_SIZE, Connection, MessageType)
 from .types import IController, IExecutionConnection
 
 
@@ -49,11 +49,13 @@ class ExecutionConnection(Connection, IExecutionConnection):
         self.__hedge_filled_message = bytearray(HEDGE_FILLED_MESSAGE_SIZE)
         self.__order_status_message = bytearray(ORDER_STATUS_MESSAGE_SIZE)
         self.__order_filled_message = bytearray(ORDER_FILLED_MESSAGE_SIZE)
+        self.__queue_position_message = bytearray(QUEUE_POSITION_MESSAGE_SIZE)
 
         HEADER.pack_into(self.__error_message, 0, ERROR_MESSAGE_SIZE, MessageType.ERROR)
         HEADER.pack_into(self.__hedge_filled_message, 0, HEDGE_FILLED_MESSAGE_SIZE, MessageType.HEDGE_FILLED)
         HEADER.pack_into(self.__order_status_message, 0, ORDER_STATUS_MESSAGE_SIZE, MessageType.ORDER_STATUS)
         HEADER.pack_into(self.__order_filled_message, 0, ORDER_FILLED_MESSAGE_SIZE, MessageType.ORDER_FILLED)
+        HEADER.pack_into(self.__queue_position_message, 0, QUEUE_POSITION_MESSAGE_SIZE, MessageType.QUEUE_POSITION)
 
     def __del__(self):
         """Clean up this instance of the ExecutionChannel class."""
@@ -150,12 +152,32 @@ class ExecutionConnection(Connection, IExecutionConnection):
         ORDER_FILLED_MESSAGE.pack_into(self.__order_filled_message, HEADER_SIZE, client_order_id, price, volume)
         self._connection_transport.write(self.__order_filled_message)
 
+    def send_order_fills(self, fills: List[Tuple[int, int, int]], statuses: List[Tuple[int, int, int, int]]) -> None:
+        """Send order filled messages followed by order status messages to the auto-trader in a single write."""
+        message = bytearray(len(fills) * ORDER_FILLED_MESSAGE_SIZE + len(statuses) * ORDER_STATUS_MESSAGE_SIZE)
+        offset = 0
+        for client_order_id, price, volume in fills:
+            HEADER.pack_into(message, offset, ORDER_FILLED_MESSAGE_SIZE, MessageType.ORDER_FILLED)
+            ORDER_FILLED_MESSAGE.pack_into(message, offset + HEADER_SIZE, client_order_id, price, volume)
+            offset += ORDER_FILLED_MESSAGE_SIZE
+        for client_order_id, fill_volume, remaining_volume, fees in statuses:
+            HEADER.pack_into(message, offset, ORDER_STATUS_MESSAGE_SIZE, MessageType.ORDER_STATUS)
+            ORDER_STATUS_MESSAGE.pack_into(message, offset + HEADER_SIZE, client_order_id, fill_volume,
+                                           remaining_volume, fees)
+            offset += ORDER_STATUS_MESSAGE_SIZE
+        self._connection_transport.write(message)
+
     def send_order_status(self, client_order_id: int, fill_volume: int, remaining_volume: int, fees: int) -> None:
         """Send an order status message to the auto-trader."""
         ORDER_STATUS_MESSAGE.pack_into(self.__order_status_message, HEADER_SIZE, client_order_id, fill_volume,
                                        remaining_volume, fees)
         self._connection_transport.write(self.__order_status_message)
 
+    def send_queue_position(self, client_order_id: int, volume_ahead: int) -> None:
+        """Send a queue position message to the auto-trader."""
+        QUEUE_POSITION_MESSAGE.pack_into(self.__queue_position_message, HEADER_SIZE, client_order_id, volume_ahead)
+        self._connection_transport.write(self.__queue_position_message)
+
 
 class ExecutionServer:
     """A server for execution connections."""
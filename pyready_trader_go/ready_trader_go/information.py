@@ -26,7 +26,6 @@ from .messages import (HEADER, HEADER_SIZE, ORDER_BOOK_HEADER, ORDER_BOOK_HEADER
 from .order_book import TOP_LEVEL_COUNT, OrderBook
 from .pubsub import PublisherFactory
 from .timer import Timer
-from .types import Instrument
 
 
 class InformationPublisher(asyncio.DatagramProtocol):
@@ -40,8 +39,8 @@ class InformationPublisher(asyncio.DatagramProtocol):
         self.__logger: logging.Logger = logging.getLogger("INFORMATION")
         self.__order_books: Tuple[OrderBook] = tuple(order_books)
         self.__publisher_factory: PublisherFactory = publisher_factory
-        self.__send_ticks_handles: List[Optional[asyncio.Handle]] = [None for _ in Instrument]
-        self.__trade_ticks_sequences: List[int] = [1 for _ in Instrument]
+        self.__send_ticks_handles: List[Optional[asyncio.Handle]] = [None for _ in self.__order_books]
+        self.__trade_ticks_sequences: List[int] = [1 for _ in self.__order_books]
         self.__transport: Optional[asyncio.WriteTransport] = None
 
         # Connect signals
@@ -0,0 +1,173 @@
+# Copyright 2021 Optiver Asia Pacific Pty. Ltd.
+#
+# This file is part of Ready Trader Go.
+#
+#     Ready Trader Go is free software: you can redistribute it and/or
+#     modify it under the terms of the GNU Affero General Public License
+#     as published by the Free Software Foundation, either version 3 of
+#     the License, or (at your option) any later version.
+#
+#     Ready Trader Go is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+#
+#     You should have received a copy of the GNU Affero General Public
+#     License along with Ready Trader Go.  If not, see
+#     <https://www.gnu.org/licenses/>.
+import math
+
+from typing import Optional, TextIO, Tuple
+
+from .market_events import (BINARY_SUFFIX, INPUT_SCALING, MARKET_DATA_DTYPE, MARKET_EVENT_BLOCK_SIZE,
+                            MARKET_EVENT_QUEUE_SIZE, open_market_data, parse_market_data, sample_depth)
+from .types import Instrument, Lifespan, MarketEventOperation
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+BURST_WINDOWS = (0.01, 0.1)  # Seconds
+TIMER_JITTER = 0.2  # Fraction of the tick interval by which the engine's timer ticks may be early or late
+
+
+def read_market_records(filename: str) -> "np.ndarray":
+    """Return all of the binary market data records in a binary or CSV market data file."""
+    if np is None:
+        raise ImportError("profiling market data requires the numpy package")
+    if filename.endswith(BINARY_SUFFIX):
+        return np.load(filename, mmap_mode="r")
+    chunks = list(parse_market_data(open_market_data(filename)))
+    return np.concatenate(chunks) if chunks else np.empty(0, dtype=MARKET_DATA_DTYPE)
+
+
+def burst_peak(times: "np.ndarray", window: float) -> Tuple[int, float]:
+    """Return the greatest number of events in any window of the given length and the time that window starts.
+
+    The times must be in ascending order.
+    """
+    if len(times) == 0:
+        return 0, 0.0
+    counts = np.searchsorted(times, times + window, side="left") - np.arange(len(times))
+    i = int(np.argmax(counts))
+    return int(counts[i]), float(times[i])
+
+
+def interval_counts(times: "np.ndarray", interval: float, duration: Optional[float] = None) -> "np.ndarray":
+    """Return the number of events in each interval from time zero to the duration (or the last event)."""
+    end = duration if duration is not None else (float(times[-1]) if len(times) else 0.0)
+    count = max(int(math.ceil(end / interval)), 1)
+    return np.bincount(np.minimum(times // interval, count - 1).astype(np.int64), minlength=count)
+
+
+def write_depth_statistics(filename: str, duration: float, depth_interval: float, file: TextIO) -> None:
+    """Replay a market data file, sampling the order books at regular intervals, and write depth statistics."""
+    times = np.arange(depth_interval, duration + depth_interval, depth_interval)
+    if len(times) == 0:
+        return
+    samples = sample_depth(filename, times)
+
+    print("\nBook depth (%d samples, every %gs):" % (len(times), depth_interval), file=file)
+    print("  %-10s %10s %10s %10s %10s %10s %10s" % ("instrument", "spread", "median", "best vol", "top vol",
+                                                     "levels", "one-sided"), file=file)
+    for instrument in Instrument:
+        ask_prices, ask_volumes, bid_prices, bid_volumes = (samples[:, instrument, i] for i in range(4))
+        two_sided = (ask_prices[:, 0] > 0) & (bid_prices[:, 0] > 0)
+        spreads = (ask_prices[two_sided, 0] - bid_prices[two_sided, 0]) / INPUT_SCALING
+        print("  %-10s %10.2f %10.2f %10.1f %10.1f %10.1f %9.1f%%"
+              % (instrument.name, spreads.mean() if len(spreads) else math.nan,
+                 np.median(spreads) if len(spreads) else math.nan,
+                 (ask_volumes[:, 0] + bid_volumes[:, 0]).mean() / 2.0,
+                 (ask_volumes.sum(axis=1) + bid_volumes.sum(axis=1)).mean() / 2.0,
+                 ((ask_volumes > 0).sum(axis=1) + (bid_volumes > 0).sum(axis=1)).mean() / 2.0,
+                 100.0 * (1.0 - two_sided.mean())), file=file)
+
+
+def write_profile(filename: str, file: TextIO, market_event_interval: float = 0.05, speed: float = 1.0,
+                  rate_interval: float = 300.0, throughput: Optional[float] = None,
+                  depth_interval: Optional[float] = 1.0) -> None:
+    """Write a profile of the market events in a market data file.
+
+    The profile covers the event rates in each rate interval, the largest
+    bursts of events, the cancel and amend ratios and the number of events
+    processed by each tick of the engine's market events timer, which ticks
+    every market_event_interval seconds of market time (speed times faster
+    in real time) and whose ticks may be up to TIMER_JITTER intervals late.
+    If the number of events the engine can process each second of real time
+    is given, ticks with more events than can be processed before the next
+    one are counted. Book depth statistics need the order books to be
+    replayed, which takes much longer than the rest of the profile, and are
+    skipped if the depth interval is None.
+    """
+    records = read_market_records(filename)
+    times = np.asarray(records["time"])
+    operations = np.asarray(records["operation"])
+    duration = float(times[-1]) if len(times) else 0.0
+
+    print("%s: %d market events over %.3f seconds (%.1f events per second)"
+          % (filename, len(times), duration, len(times) / duration if duration else 0.0), file=file)
+
+    # Event rates over time
+    inserts = operations == MarketEventOperation.INSERT
+    amends = operations == MarketEventOperation.AMEND
+    cancels = operations == MarketEventOperation.CANCEL
+    totals = interval_counts(times, rate_interval, duration)
+    print("\nEvent rates (events per second in each %gs interval):" % rate_interval, file=file)
+    print("  %10s %10s %10s %10s %10s" % ("start", "total", "insert", "amend", "cancel"), file=file)
+    columns = [interval_counts(times[mask], rate_interval, duration) for mask in (inserts, amends, cancels)]
+    for i, total in enumerate(totals):
+        length = min(rate_interval, duration - i * rate_interval) or rate_interval  # The last may be shorter
+        print("  %10.1f %10.1f %10.1f %10.1f %10.1f" % (i * rate_interval, total / length,
+                                                        *(c[i] / length for c in columns)), file=file)
+
+    # Burst peaks
+    print("\nBurst peaks:", file=file)
+    for window in BURST_WINDOWS:
+        peak, start = burst_peak(times, window)
+        print("  %6gms: %d events from %.6f (%.0f events per second)" % (window * 1000.0, peak, start,
+                                                                          peak / window), file=file)
+
+    # Cancel and amend ratios
+    instruments = np.asarray(records["instrument"])
+    lifespans = np.asarray(records["lifespan"])
+    print("\nOrder flow:", file=file)
+    print("  %-10s %10s %10s %10s %10s %10s %10s" % ("instrument", "inserts", "fak", "amends", "cancels",
+                                                     "amend/gfd", "cancel/gfd"), file=file)
+    for instrument in Instrument:
+        mask = instruments == instrument
+        insert_count = int(np.count_nonzero(mask & inserts))
+        fak_count = int(np.count_nonzero(mask & inserts & (lifespans == Lifespan.FILL_AND_KILL)))
+        gfd_count = insert_count - fak_count
+        amend_count = int(np.count_nonzero(mask & amends))
+        cancel_count = int(np.count_nonzero(mask & cancels))
+        print("  %-10s %10d %10d %10d %10d %10.3f %10.3f"
+              % (instrument.name, insert_count, fak_count, amend_count, cancel_count,
+                 amend_count / gfd_count if gfd_count else math.nan,
+                 cancel_count / gfd_count if gfd_count else math.nan), file=file)
+
+    # Load on the engine's market events timer
+    ticks = interval_counts(times, market_event_interval, duration)
+    peak = int(ticks.max()) if len(ticks) else 0
+    late_peak, late_start = burst_peak(times, market_event_interval * (1.0 + 2.0 * TIMER_JITTER))
+    tick_seconds = market_event_interval / speed
+    blocks = int(math.ceil(late_peak / MARKET_EVENT_BLOCK_SIZE))
+    print("\nMarket events timer (interval %gs, speed %g, %gms per tick in real time):"
+          % (market_event_interval, speed, tick_seconds * 1000.0), file=file)
+    print("  events per tick: mean %.1f, 99th percentile %.0f, max %d" % (ticks.mean(), np.percentile(ticks, 99),
+                                                                       peak), file=file)
+    print("  events per late tick: max %d from %.6f" % (late_peak, late_start), file=file)
+    print("  required throughput: %.0f events per second at the peak, %.0f on average"
+          % (peak / tick_seconds, len(times) / duration * speed if duration else 0.0), file=file)
+    print("  queue blocks per late tick: %d of %d events (MARKET_EVENT_QUEUE_SIZE is %d)"
+          % (blocks, MARKET_EVENT_BLOCK_SIZE, MARKET_EVENT_QUEUE_SIZE), file=file)
+    if throughput is not None:
+        behind = np.flatnonzero(ticks > throughput * tick_seconds)
+        print("  ticks over %.0f events per second: %d%s" % (throughput, len(behind),
+                                                            " (first at %.3f)" % (behind[0] * market_event_interval)
+                                                            if len(behind) else ""), file=file)
+        print("  fastest speed without falling behind: %.2f" % (throughput * market_event_interval / peak
+                                                                 if peak else math.inf), file=file)
+
+    if depth_interval is not None:
+        write_depth_statistics(filename, duration, depth_interval, file)
@@ -37,6 +37,7 @@ class MessageType(enum.IntEnum):
     LOGIN = 7
     ORDER_FILLED = 8
     ORDER_STATUS = 9
+    QUEUE_POSITION = 12
 
     # Information messages
     ORDER_BOOK_UPDATE = 10
@@ -68,6 +69,7 @@ ORDER_BOOK_HEADER = struct.Struct("!BI")  # Instrument and sequence number
 ORDER_BOOK_MESSAGE = struct.Struct("!%dI" % (4 * order_book.TOP_LEVEL_COUNT))  # Prices & volumes for best bids & asks
 ORDER_FILLED_MESSAGE = struct.Struct("!III")  # Client order id, price, volume
 ORDER_STATUS_MESSAGE = struct.Struct("!IIIi")  # Client order id, fill volume, remaining volume and fees
+QUEUE_POSITION_MESSAGE = struct.Struct("!II")  # Client order id, volume ahead
 TRADE_TICKS_HEADER = struct.Struct("!BI")  # Instrument and sequence number
 TRADE_TICKS_MESSAGE = struct.Struct("!%dI" % (4 * order_book.TOP_LEVEL_COUNT))  # Prices & volumes for best bids & asks
 
@@ -98,6 +100,7 @@ ORDER_BOOK_HEADER_SIZE: int = HEADER.size + ORDER_BOOK_HEADER.size
 ORDER_BOOK_MESSAGE_SIZE: int = ORDER_BOOK_HEADER_SIZE + ORDER_BOOK_MESSAGE.size
 ORDER_FILLED_MESSAGE_SIZE: int = HEADER.size + ORDER_FILLED_MESSAGE.size
 ORDER_STATUS_MESSAGE_SIZE: int = HEADER.size + ORDER_STATUS_MESSAGE.size
+QUEUE_POSITION_MESSAGE_SIZE: int = HEADER.size + QUEUE_POSITION_MESSAGE.size
 TRADE_TICKS_HEADER_SIZE: int = HEADER.size + TRADE_TICKS_HEADER.size
 TRADE_TICKS_MESSAGE_SIZE: int = TRADE_TICKS_HEADER_SIZE + TRADE_TICKS_MESSAGE.size
 
@@ -16,16 +16,29 @@
 #     License along with Ready Trader Go.  If not, see
 #     <https://www.gnu.org/licenses/>.
 from bisect import bisect, insort_left
-import collections
+import struct
 
-from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
-from .types import Instrument, Lifespan, Side
+from .types import Instrument, Lifespan, MarketEventOperation, Side
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 MINIMUM_BID = 1
 MAXIMUM_ASK = 2 ** 31 - 1
 TOP_LEVEL_COUNT = 5
+LADDER_INITIAL_SIZE = 1024
+LADDER_MAXIMUM_SIZE = 1 << 14  # Levels further than this many ticks from the best price are kept in a sorted ladder
+JOURNAL_DEFAULT_SIZE = 4096
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct("!HIIII")  # Format version, last traded price, tick counts and order count
+SNAPSHOT_TICK = struct.Struct("!II")  # Price and volume
+SNAPSHOT_ORDER = struct.Struct("!QBBIIIq")  # Client order id, side, lifespan, price, volume, remaining and fees
 
 
 class IOrderListener(object):
@@ -45,11 +58,20 @@ class IOrderListener(object):
         """Called when the order is partially or completely filled."""
         pass
 
+    def on_orders_filled(self, now: float, fills: List[Tuple[Any, int, int, int]]) -> None:
+        """Called once per aggressive order with the (order, price, volume, fee) fills of this listener's orders.
+
+        Fills are in the order they occurred, but the orders are in their state
+        after the last fill. By default, on_order_filled is called for each fill.
+        """
+        for order, price, volume, fee in fills:
+            self.on_order_filled(now, order, price, volume, fee)
+
 
 class Order(object):
     """A request to buy or sell at a given price."""
-    __slots__ = ("client_order_id", "instrument", "lifespan", "listener", "price", "remaining_volume", "side",
-                 "total_fees", "volume")
+    __slots__ = ("client_order_id", "instrument", "lifespan", "listener", "next_order", "prev_order", "price",
+                 "remaining_volume", "sequence", "side", "total_fees", "volume", "volume_ahead")
 
     def __init__(self, client_order_id: int, instrument: Instrument, lifespan: Lifespan, side: Side, price: int,
                  volume: int, listener: Optional[IOrderListener] = None):
@@ -64,6 +86,14 @@ class Order(object):
         self.volume: int = volume
         self.listener: IOrderListener = listener
 
+        # Links to the neighbouring orders while this order rests in a price level
+        self.next_order: Optional[Order] = None
+        self.prev_order: Optional[Order] = None
+
+        # Time priority (zero until placed) and, if tracked, the volume ahead of this order at its price level
+        self.sequence: int = 0
+        self.volume_ahead: Optional[int] = None
+
     def __str__(self):
         """Return a string containing a description of this order object."""
         args = (self.client_order_id, self.instrument, self.lifespan.name, self.side.name, self.price, self.volume,
@@ -72,25 +102,649 @@ class Order(object):
             "total_fees=%d}"
         return s % args
 
+    def reset(self, client_order_id: int, instrument: Instrument, lifespan: Lifespan, side: Side, price: int,
+              volume: int, listener: Optional[IOrderListener] = None) -> None:
+        """Reinitialise this order so that a finished order object can be reused."""
+        self.client_order_id = client_order_id
+        self.instrument = instrument
+        self.lifespan = lifespan
+        self.side = side
+        self.price = price
+        self.remaining_volume = volume
+        self.total_fees = 0
+        self.volume = volume
+        self.listener = listener
+        self.next_order = None
+        self.prev_order = None
+        self.sequence = 0
+        self.volume_ahead = None
+
+
+class PriceLevel(object):
+    """The orders resting at a single price, in time priority.
+
+    The orders form an intrusive doubly-linked list (through their
+    next_order and prev_order slots) so that any order can be unlinked in
+    constant time. The level also keeps the (few) orders whose queue
+    position is being tracked.
+    """
+    __slots__ = ("first_order", "last_order", "price", "total_volume", "tracked_orders")
+
+    def __init__(self, price: int):
+        """Initialise a new instance of the PriceLevel class."""
+        self.first_order: Optional[Order] = None
+        self.last_order: Optional[Order] = None
+        self.price: int = price
+        self.total_volume: int = 0
+        self.tracked_orders: List[Order] = []
+
+    def append(self, order: Order) -> None:
+        """Add an order to the back of the queue."""
+        last = order.prev_order = self.last_order
+        order.next_order = None
+        if last is None:
+            self.first_order = order
+        else:
+            last.next_order = order
+        self.last_order = order
+
+    def orders(self) -> Iterator[Order]:
+        """Return an iterator over the orders in the queue from first to last."""
+        order = self.first_order
+        while order is not None:
+            yield order
+            order = order.next_order
+
+    def remove(self, order: Order) -> None:
+        """Unlink an order from the queue."""
+        prev_order = order.prev_order
+        next_order = order.next_order
+        if prev_order is None:
+            self.first_order = next_order
+        else:
+            prev_order.next_order = next_order
+        if next_order is None:
+            self.last_order = prev_order
+        else:
+            next_order.prev_order = prev_order
+        order.next_order = order.prev_order = None
+        if order.volume_ahead is not None:
+            self.tracked_orders.remove(order)
+            order.volume_ahead = None
+
+    def track(self, order: Order) -> Optional[int]:
+        """Start tracking the queue position of an order in this level and return the volume ahead of it."""
+        volume_ahead = 0
+        ahead = self.first_order
+        while ahead is not order:
+            if ahead is None:
+                return None
+            volume_ahead += ahead.remaining_volume
+            ahead = ahead.next_order
+        order.volume_ahead = volume_ahead
+        self.tracked_orders.append(order)
+        return volume_ahead
+
+    def volume_removed(self, order: Order, volume: int) -> None:
+        """Move the tracked orders queued behind the given order up by the volume removed from it."""
+        sequence = order.sequence
+        for tracked in self.tracked_orders:
+            if tracked.sequence > sequence:
+                tracked.volume_ahead -= volume
+
+
+class TradeSummary(object):
+    """A summary of the trades made by one aggressive order."""
+    __slots__ = ("last_price", "level_count", "side", "value", "volume")
+
+    def __init__(self, side: Side, level_count: int, volume: int, value: int, last_price: int):
+        """Initialise a new instance of the TradeSummary class."""
+        self.last_price: int = last_price
+        self.level_count: int = level_count
+        self.side: Side = side
+        self.value: int = value
+        self.volume: int = volume
+
+    @property
+    def vwap(self) -> float:
+        """Return the volume-weighted average price of the trades."""
+        return self.value / self.volume
+
+
+class TradeTicks(object):
+    """The volume traded at the best TOP_LEVEL_COUNT prices on one side of the book.
+
+    Prices are kept in fixed-size arrays ordered from best to worst (lowest
+    first for asks, highest first for bids). Prices worse than the worst
+    tracked price are dropped, as they would never be published.
+    """
+    __slots__ = ("count", "prices", "sign", "volumes")
+
+    def __init__(self, side: Side):
+        """Initialise a new instance of the TradeTicks class."""
+        self.count: int = 0
+        self.prices: List[int] = [0] * TOP_LEVEL_COUNT
+        self.sign: int = -1 if side == Side.SELL else 1
+        self.volumes: List[int] = [0] * TOP_LEVEL_COUNT
+
+    def add(self, price: int, volume: int) -> None:
+        """Record volume traded at the given price."""
+        prices = self.prices
+        key = self.sign * price
+        i = 0
+        while i < self.count and self.sign * prices[i] > key:
+            i += 1
+
+        if i < self.count and prices[i] == price:
+            self.volumes[i] += volume
+        elif i < TOP_LEVEL_COUNT:
+            if self.count < TOP_LEVEL_COUNT:
+                self.count += 1
+            prices.insert(i, price)
+            del prices[TOP_LEVEL_COUNT]
+            self.volumes.insert(i, volume)
+            del self.volumes[TOP_LEVEL_COUNT]
+
+    def clear(self) -> None:
+        """Forget all recorded trades."""
+        for i in range(self.count):
+            self.prices[i] = self.volumes[i] = 0
+        self.count = 0
+
+    def items(self) -> Iterator[Tuple[int, int]]:
+        """Return an iterator over the recorded (price, volume) pairs from best to worst."""
+        return zip(self.prices[:self.count], self.volumes[:self.count])
+
+    def publish(self, prices: List[int], volumes: List[int]) -> None:
+        """Copy the recorded prices and volumes (padded with zeros) into the supplied lists and clear them."""
+        prices[:] = self.prices
+        volumes[:] = self.volumes
+        self.clear()
+
+
+class PriceLadder(object):
+    """The price levels on one side of an order book."""
+
+    def __init__(self, side: Side):
+        """Initialise a new instance of the PriceLadder class."""
+        self.side: Side = side
+
+        # Ask prices are negated so that better prices always have greater keys
+        self._sign: int = -1 if side == Side.SELL else 1
+
+    def __bool__(self) -> bool:
+        """Return True if there is at least one price level."""
+        raise NotImplementedError()
+
+    def add_level(self, price: int) -> PriceLevel:
+        """Create and return a new, empty price level."""
+        raise NotImplementedError()
+
+    def adjust_volume(self, level: PriceLevel, delta: int) -> None:
+        """Change the total volume of the given price level."""
+        level.total_volume += delta
+
+    def best_level(self) -> Optional[PriceLevel]:
+        """Return the best price level, or None if there are no price levels."""
+        raise NotImplementedError()
+
+    def get_level(self, price: int) -> Optional[PriceLevel]:
+        """Return the price level at the given price, or None if there is no such level."""
+        raise NotImplementedError()
+
+    def levels(self) -> Iterator[PriceLevel]:
+        """Return an iterator over the price levels from best to worst."""
+        raise NotImplementedError()
+
+    def remove_level(self, level: PriceLevel) -> None:
+        """Remove the given (empty) price level."""
+        raise NotImplementedError()
+
+    def sweep(self, volume: int, limit_price: int) -> Tuple[int, int, int]:
+        """Return the volume, total value and worst price of a trade for up to
+        the given volume against levels priced no worse than the limit price.
+        """
+        sign: int = self._sign
+        limit_key: int = sign * limit_price
+        total_volume: int = 0
+        total_value: int = 0
+        worst_price: int = 0
+
+        for level in self.levels():
+            price: int = level.price
+            if total_volume >= volume or sign * price < limit_key:
+                break
+            available: int = level.total_volume
+            required: int = volume - total_volume
+            weight: int = required if required <= available else available
+            total_volume += weight
+            total_value += weight * price
+            worst_price = price
+
+        return total_volume, total_value, worst_price
+
+
+class SortedPriceLadder(PriceLadder):
+    """Price levels kept in a sorted list of prices with the best price last."""
+
+    def __init__(self, side: Side):
+        """Initialise a new instance of the SortedPriceLadder class."""
+        super().__init__(side)
+        self.__keys: List[int] = []
+        self.__levels: Dict[int, PriceLevel] = {}
+
+    def __bool__(self) -> bool:
+        """Return True if there is at least one price level."""
+        return bool(self.__keys)
+
+    def add_level(self, price: int) -> PriceLevel:
+        """Create and return a new, empty price level."""
+        level = self.__levels[price] = PriceLevel(price)
+        insort_left(self.__keys, self._sign * price)
+        return level
+
+    def insert_level(self, level: PriceLevel) -> None:
+        """Add an existing price level, together with its orders."""
+        self.__levels[level.price] = level
+        insort_left(self.__keys, self._sign * level.price)
+
+    def best_level(self) -> Optional[PriceLevel]:
+        """Return the best price level, or None if there are no price levels."""
+        return self.__levels[self._sign * self.__keys[-1]] if self.__keys else None
+
+    def get_level(self, price: int) -> Optional[PriceLevel]:
+        """Return the price level at the given price, or None if there is no such level."""
+        return self.__levels.get(price)
+
+    def levels(self) -> Iterator[PriceLevel]:
+        """Return an iterator over the price levels from best to worst."""
+        levels = self.__levels
+        sign = self._sign
+        return (levels[sign * k] for k in reversed(self.__keys))
+
+    def remove_level(self, level: PriceLevel) -> None:
+        """Remove the given price level."""
+        del self.__levels[level.price]
+        key = self._sign * level.price
+        if self.__keys[-1] == key:
+            self.__keys.pop()
+        else:
+            self.__keys.pop(bisect(self.__keys, key) - 1)
+
+
+class TickPriceLadder(PriceLadder):
+    """Price levels held in an array indexed by the number of ticks from a base price.
+
+    Adding and removing a level is O(1) and the best level is tracked with a
+    cursor, so the cost of an emptied best level is a short scan to the next
+    occupied tick. The array grows (in either direction) as required, up to
+    maximum_size ticks. Levels that do not fit are worse than every level in
+    the array and are kept in a SortedPriceLadder. The array is moved to
+    centre it on the best price when a better price does not fit or when its
+    last level is removed. Every price must be a multiple of the tick size.
+
+    Fenwick trees over the volume and value (volume times price) of each
+    level in the array let a sweep through the ladder be priced in O(log n).
+    Changes to the ladder only mark the trees as stale, so that adding,
+    removing and resizing levels stays O(1); the trees are rebuilt, in
+    linear time, by the first sweep after a change.
+    """
+
+    def __init__(self, side: Side, tick_size: int, initial_size: int = LADDER_INITIAL_SIZE,
+                 maximum_size: int = LADDER_MAXIMUM_SIZE):
+        """Initialise a new instance of the TickPriceLadder class."""
+        super().__init__(side)
+        self.__base: int = 0
+        self.__best: int = -1
+        self.__count: int = 0
+        self.__levels: List[Optional[PriceLevel]] = [None] * initial_size
+        self.__maximum_size: int = max(maximum_size, initial_size)
+        self.__overflow: SortedPriceLadder = SortedPriceLadder(side)
+        self.__tick_size: int = tick_size
+        self.__trees_stale: bool = False
+        self.__value_tree: List[int] = [0] * (initial_size + 1)
+        self.__volume_tree: List[int] = [0] * (initial_size + 1)
+
+    def __bool__(self) -> bool:
+        """Return True if there is at least one price level."""
+        return self.__count > 0  # The overflow ladder is empty whenever the array is
+
+    def __absorb(self) -> None:
+        """Move the levels in the overflow ladder that lie within the array into it."""
+        moved = list()
+        for level in self.__overflow.levels():
+            index = self.__index(level.price)
+            if index < 0:
+                break
+            moved.append((index, level))
+        for index, level in moved:
+            self.__overflow.remove_level(level)
+            self.__levels[index] = level
+            self.__count += 1
+
+    def __grow(self, index: int) -> Optional[int]:
+        """Grow the array so that it covers the given index and return the adjusted index.
+
+        Return None, leaving the array unchanged, if the array would grow
+        beyond its maximum size.
+        """
+        levels = self.__levels
+        size = len(levels)
+        required = size - index if index < 0 else index + 1
+        if required > self.__maximum_size:
+            return None
+        extra = min(max(size, required - size), self.__maximum_size - size)
+        if index < 0:
+            self.__levels = [None] * extra + levels
+            self.__base -= extra * self.__tick_size
+            if self.__best >= 0:
+                self.__best += extra
+            index += extra
+        else:
+            levels.extend([None] * extra)
+        self.__absorb()
+        self.__trees_stale = True
+        return index
+
+    def __prefix(self, tree: List[int], count: int) -> int:
+        """Return the sum of the first count entries of the given Fenwick tree."""
+        total = 0
+        while count > 0:
+            total += tree[count]
+            count &= count - 1
+        return total
+
+    def __search(self, tree: List[int], target: int) -> int:
+        """Return the greatest count for which the prefix sum of the given Fenwick tree is no more than target."""
+        size = len(tree) - 1
+        index = 0
+        step = 1 << (size.bit_length() - 1)
+        while step:
+            if index + step <= size and tree[index + step] <= target:
+                index += step
+                target -= tree[index]
+            step >>= 1
+        return index
+
+    def __recentre(self, price: int) -> None:
+        """Move the array so that it is centred on the given price, which must be the best price."""
+        levels = [level for level in self.__levels if level is not None]
+        levels.extend(self.__overflow.levels())
+        size = len(self.__levels)
+        self.__base = self._sign * price - (size // 2) * self.__tick_size
+        self.__best = -1
+        self.__count = 0
+        self.__levels = [None] * size
+        self.__overflow = SortedPriceLadder(self.side)
+        for level in levels:
+            index = self.__index(level.price)
+            if index < 0:
+                self.__overflow.insert_level(level)
+            else:
+                self.__levels[index] = level
+                self.__count += 1
+                if index > self.__best:
+                    self.__best = index
+        self.__trees_stale = True
+
+    def __rebuild_trees(self) -> None:
+        """Rebuild the Fenwick trees from the price levels in linear time."""
+        size = len(self.__levels)
+        value_tree = self.__value_tree = [0] * (size + 1)
+        volume_tree = self.__volume_tree = [0] * (size + 1)
+        for i, level in enumerate(self.__levels, 1):
+            if level is not None:
+                volume_tree[i] += level.total_volume
+                value_tree[i] += level.total_volume * level.price
+            parent = i + (i & -i)
+            if parent <= size:
+                volume_tree[parent] += volume_tree[i]
+                value_tree[parent] += value_tree[i]
+        self.__trees_stale = False
+
+    def __index(self, price: int) -> int:
+        """Return the array index for the given price (which may lie outside the array)."""
+        offset = self._sign * price - self.__base
+        if offset % self.__tick_size:
+            raise ValueError("price %d is not a multiple of the tick size %d" % (price, self.__tick_size))
+        return offset // self.__tick_size
+
+    def add_level(self, price: int) -> PriceLevel:
+        """Create and return a new, empty price level."""
+        if self.__count == 0:
+            # Centre the (empty) array on the first price seen
+            self.__base = self._sign * price - (len(self.__levels) // 2) * self.__tick_size
+            self.__best = -1
+
+        index = self.__index(price)
+        if not 0 <= index < len(self.__levels):
+            grown = self.__grow(index)
+            if grown is not None:
+                index = grown
+            elif index < 0:
+                return self.__overflow.add_level(price)
+            else:
+                self.__recentre(price)
+                index = self.__index(price)
+
+        level = self.__levels[index] = PriceLevel(price)
+        self.__count += 1
+        if index > self.__best:
+            self.__best = index
+        return level
+
+    def adjust_volume(self, level: PriceLevel, delta: int) -> None:
+        """Change the total volume of the given price level."""
+        level.total_volume += delta
+        self.__trees_stale = True
+
+    def best_level(self) -> Optional[PriceLevel]:
+        """Return the best price level, or None if there are no price levels."""
+        return self.__levels[self.__best] if self.__count else None
+
+    def get_level(self, price: int) -> Optional[PriceLevel]:
+        """Return the price level at the given price, or None if there is no such level."""
+        offset = self._sign * price - self.__base
+        index = offset // self.__tick_size
+        if self.__count and offset % self.__tick_size == 0 and 0 <= index < len(self.__levels):
+            return self.__levels[index]
+        return self.__overflow.get_level(price) if index < 0 else None
+
+    def levels(self) -> Iterator[PriceLevel]:
+        """Return an iterator over the price levels from best to worst."""
+        levels = self.__levels
+        remaining = self.__count
+        i = self.__best
+        while remaining:
+            level = levels[i]
+            if level is not None:
+                yield level
+                remaining -= 1
+            i -= 1
+        yield from self.__overflow.levels()
+
+    def remove_level(self, level: PriceLevel) -> None:
+        """Remove the given price level."""
+        levels = self.__levels
+        index = self.__index(level.price)
+        if index < 0:
+            self.__overflow.remove_level(level)
+            return
+        levels[index] = None
+        self.__count -= 1
+        if index == self.__best:
+            if self.__count:
+                index -= 1
+                while levels[index] is None:
+                    index -= 1
+                self.__best = index
+            elif self.__overflow:
+                self.__recentre(self.__overflow.best_level().price)
+            else:
+                self.__best = -1
+
+    def sweep(self, volume: int, limit_price: int) -> Tuple[int, int, int]:
+        """Return the volume, total value and worst price of a trade for up to
+        the given volume against levels priced no worse than the limit price.
+        """
+        if self.__count == 0 or volume <= 0:
+            return 0, 0, 0
+        if self.__trees_stale:
+            self.__rebuild_trees()
+
+        levels = self.__levels
+        value_tree = self.__value_tree
+        volume_tree = self.__volume_tree
+        size = len(levels)
+
+        # Better levels have higher indices, so the volume available from the
+        # best level down to index i is the total volume less prefix(i).
+        total_volume = self.__prefix(volume_tree, size)
+        total_value = self.__prefix(value_tree, size)
+        limit_index = -((self.__base - self._sign * limit_price) // self.__tick_size)
+        limit_index = 0 if limit_index < 0 else size if limit_index > size else limit_index
+        limit_prefix = self.__prefix(volume_tree, limit_index)
+
+        available = total_volume - limit_prefix
+        if available < volume and self.__overflow and limit_index == 0:
+            # Take everything in the array, then continue with the (worse) levels in the overflow ladder
+            overflow_volume, overflow_value, worst_price = self.__overflow.sweep(volume - available, limit_price)
+            if overflow_volume:
+                return available + overflow_volume, total_value + overflow_value, worst_price
+        if available == 0:
+            return 0, 0, 0
+        if available <= volume:
+            # Take everything up to the limit
+            index = self.__search(volume_tree, limit_prefix)
+            return available, total_value - self.__prefix(value_tree, limit_index), levels[index].price
+
+        # Take everything better than the worst level required, then the remainder from that level
+        index = self.__search(volume_tree, total_volume - volume)
+        level = levels[index]
+        better_volume = total_volume - self.__prefix(volume_tree, index + 1)
+        better_value = total_value - self.__prefix(value_tree, index + 1)
+        weight = volume - better_volume
+        return volume, better_value + weight * level.price, level.price
+
+
+def create_price_ladder(ladder_type: str, side: Side, tick_size: int) -> PriceLadder:
+    """Return a new price ladder of the given type ('sorted' or 'tick')."""
+    if ladder_type == "sorted":
+        return SortedPriceLadder(side)
+    if ladder_type == "tick":
+        return TickPriceLadder(side, tick_size)
+    raise ValueError("ladder type must be either 'sorted' or 'tick'")
+
+
+class BookJournal(object):
+    """A bounded ring buffer of changes to the total volume of price levels.
+
+    Each entry is a (sequence, side, price, new_total_volume) tuple, where a
+    new total volume of zero means the level has been removed. Once the
+    buffer is full the oldest entries are overwritten.
+    """
+
+    def __init__(self, capacity: int = JOURNAL_DEFAULT_SIZE):
+        """Initialise a new instance of the BookJournal class."""
+        if capacity <= 0:
+            raise ValueError("journal capacity must be positive")
+        self.capacity: int = capacity
+        self.sequence: int = 0  # Sequence number of the next entry
+        self.__prices: List[int] = [0] * capacity
+        self.__sides: List[Side] = [Side.BUY] * capacity
+        self.__volumes: List[int] = [0] * capacity
+
+    def cursor(self) -> "JournalCursor":
+        """Return a cursor positioned after the latest entry in this journal."""
+        return JournalCursor(self, self.sequence)
+
+    def entries(self, start: int) -> List[Tuple[int, Side, int, int]]:
+        """Return the entries from the given sequence number onwards.
+
+        The start must not be older than the oldest entry still held.
+        """
+        if start < self.sequence - self.capacity or start > self.sequence:
+            raise ValueError("journal sequence %d is not available" % start)
+        capacity = self.capacity
+        return [(seq, self.__sides[seq % capacity], self.__prices[seq % capacity], self.__volumes[seq % capacity])
+                for seq in range(start, self.sequence)]
+
+    def record(self, side: Side, price: int, total_volume: int) -> None:
+        """Record the new total volume of a price level."""
+        i = self.sequence % self.capacity
+        self.__sides[i] = side
+        self.__prices[i] = price
+        self.__volumes[i] = total_volume
+        self.sequence += 1
+
+
+class JournalCursor(object):
+    """A reader's position in a book journal."""
+
+    def __init__(self, journal: BookJournal, position: int):
+        """Initialise a new instance of the JournalCursor class."""
+        self.journal: BookJournal = journal
+        self.position: int = position
+
+    def read(self) -> Optional[List[Tuple[int, Side, int, int]]]:
+        """Return the entries added since the last read and advance past them.
+
+        Return None if the reader has fallen so far behind that some entries
+        were overwritten, in which case the cursor skips to the end of the
+        journal and the reader should resynchronise from the order book.
+        """
+        journal = self.journal
+        if self.position < journal.sequence - journal.capacity:
+            self.position = journal.sequence
+            return None
+        result = journal.entries(self.position)
+        self.position = journal.sequence
+        return result
+
 
 class OrderBook(object):
     """A collection of orders arranged by the price-time priority principle."""
 
-    def __init__(self, instrument: Instrument, maker_fee: float, taker_fee: float):
-        """Initialise a new instance of the OrderBook class."""
-        self.instrument: Instrument = instrument
+    def __init__(self, instrument: int, maker_fee: float, taker_fee: float, ladder_type: str = "sorted",
+                 tick_size: int = 1):
+        """Initialise a new instance of the OrderBook class.
+
+        The ladder type selects how price levels are indexed: 'sorted' keeps
+        a sorted list of prices, while 'tick' indexes levels by the number
+        of ticks (of tick_size cents) from a base price.
+        """
+        self.instrument: int = instrument
         self.maker_fee: float = maker_fee
         self.taker_fee: float = taker_fee
+        self.tick_size: int = tick_size
+
+        self.__ladder_type: str = ladder_type
 
-        self.__ask_prices: List[int] = []
-        self.__ask_ticks: Dict[int, int] = collections.defaultdict(int)
-        self.__bid_prices: List[int] = []
-        self.__bid_ticks: Dict[int, int] = collections.defaultdict(int)
+        self.__asks: PriceLadder = create_price_ladder(ladder_type, Side.SELL, tick_size)
+        self.__ask_ticks: TradeTicks = TradeTicks(Side.SELL)
+        self.__bids: PriceLadder = create_price_ladder(ladder_type, Side.BUY, tick_size)
+        self.__bid_ticks: TradeTicks = TradeTicks(Side.BUY)
+        self.__fills: List[Tuple[Order, int, int, int]] = list()
         self.__last_traded_price: Optional[int] = None
-        self.__levels: Dict[int, Deque[Order]] = {}
-        self.__total_volumes: Dict[int, int] = {}
+        self.__journal: Optional[BookJournal] = None
+        self.__sequence: int = 0
+        self.__signals_deferred: bool = False
+        self.__trade_pending: bool = False
+
+        # The version is bumped by every change to the book and is used to
+        # memoize the results of queries derived from the book's state.
+        self.version: int = 0
+        self.__midpoint_price: Optional[float] = None
+        self.__midpoint_version: int = -1
+        self.__top_levels: Tuple[Tuple[int, ...], ...] = ()
+        self.__top_levels_version: int = -1
+        self.__trades: Dict[Tuple[int, int, int], Tuple[int, int]] = {}
+        self.__trades_version: int = -1
 
-        # Signals
+        # Signals: trade_occurred is emitted once for each aggressive order
+        # that trades (or once per batch, see apply_batch) and order_traded
+        # once for each aggressive order that trades, with a summary
+        self.order_traded: List[Callable[[Any, TradeSummary], None]] = list()
         self.trade_occurred: List[Callable[[Any], None]] = list()
 
     def __str__(self):
@@ -109,34 +763,144 @@ class OrderBook(object):
         if order.remaining_volume > 0:
             fill_volume = order.volume - order.remaining_volume
             diff = order.volume - (fill_volume if new_volume < fill_volume else new_volume)
-            self.remove_volume_from_level(order.price, diff, order.side)
+            self.remove_volume(order, diff)
             order.volume -= diff
             order.remaining_volume -= diff
             if order.listener:
                 order.listener.on_order_amended(now, order, diff)
 
+    def apply_batch(self, events: Iterable[Tuple[float, MarketEventOperation, Order, int]]) -> None:
+        """Apply a run of (time, operation, order, volume) events to this order book.
+
+        Inserts that do not cross the book are placed directly and only
+        crossing inserts take the full insert path. For amends, the volume is
+        the (negative) change to the order's volume. The trade_occurred signal
+        is deferred until the whole run has been applied and then emitted once.
+        """
+        asks = self.__asks
+        bids = self.__bids
+        self.__signals_deferred = True
+        try:
+            for now, operation, order, volume in events:
+                if operation == MarketEventOperation.INSERT:
+                    if order.side == Side.SELL:
+                        crossed = bids and order.price <= bids.best_level().price
+                    else:
+                        crossed = asks and order.price >= asks.best_level().price
+                    if crossed:
+                        self.insert(now, order)
+                    elif order.lifespan == Lifespan.FILL_AND_KILL:
+                        remaining = order.remaining_volume
+                        order.remaining_volume = 0
+                        if order.listener:
+                            order.listener.on_order_cancelled(now, order, remaining)
+                    else:
+                        self.place(now, order)
+                elif operation == MarketEventOperation.CANCEL:
+                    self.cancel(now, order)
+                elif volume < 0:
+                    self.amend(now, order, order.volume + volume)
+        finally:
+            self.__signals_deferred = False
+
+        if self.__trade_pending:
+            self.__trade_pending = False
+            for callback in self.trade_occurred:
+                callback(self)
+
     def best_ask(self) -> Optional[int]:
         """Return the current best ask price, or None if there are no ask orders."""
-        return -self.__ask_prices[-1] if self.__ask_prices else None
+        level = self.__asks.best_level()
+        return level.price if level is not None else None
 
     def best_bid(self) -> Optional[int]:
         """Return the current best ask price, or None if there are no ask orders."""
-        return self.__bid_prices[-1] if self.__bid_prices else None
+        level = self.__bids.best_level()
+        return level.price if level is not None else None
 
     def cancel(self, now: float, order: Order) -> None:
         """Cancel an order in this order book."""
         if order.remaining_volume > 0:
-            self.remove_volume_from_level(order.price, order.remaining_volume, order.side)
+            self.remove_volume(order, order.remaining_volume)
             remaining = order.remaining_volume
             order.remaining_volume = 0
             if order.listener:
                 order.listener.on_order_cancelled(now, order, remaining)
 
+    def dispatch_fills(self, now: float) -> None:
+        """Deliver the fills made by an aggressive order to their listeners, one batch per listener."""
+        fills = self.__fills
+        self.__fills = list()
+
+        listener = fills[0][0].listener
+        if all(fill[0].listener is listener for fill in fills):
+            listener.on_orders_filled(now, fills)
+            return
+
+        batches: Dict[IOrderListener, List[Tuple[Order, int, int, int]]] = dict()
+        for fill in fills:
+            batch = batches.get(fill[0].listener)
+            if batch is None:
+                batches[fill[0].listener] = [fill]
+            else:
+                batch.append(fill)
+        for listener, batch in batches.items():
+            listener.on_orders_filled(now, batch)
+
+    def enable_journal(self, capacity: int = JOURNAL_DEFAULT_SIZE) -> BookJournal:
+        """Start recording price level changes in a journal and return it.
+
+        If a journal is already enabled, it is returned unchanged.
+        """
+        if self.__journal is None:
+            self.__journal = BookJournal(capacity)
+        return self.__journal
+
+    def depth_arrays(self, levels: int = TOP_LEVEL_COUNT, out: Optional["np.ndarray"] = None) -> "np.ndarray":
+        """Return the prices and volumes of the best levels of this book as a NumPy array.
+
+        Rows zero and one hold the ask prices and volumes and rows two and
+        three the bid prices and volumes, best first and padded with zeros.
+        If out is given it must have the shape (4, levels) and it is filled
+        in place and returned instead of allocating a new array.
+        """
+        if np is None:
+            raise ImportError("depth arrays require the numpy package")
+        if out is None:
+            out = np.zeros((4, levels), dtype=np.int64)
+        elif out.shape != (4, levels):
+            raise ValueError("depth array should have the shape (4, %d)" % levels)
+
+        for row, ladder in ((0, self.__asks), (2, self.__bids)):
+            prices = out[row]
+            volumes = out[row + 1]
+            i = 0
+            for level in ladder.levels():
+                if i == levels:
+                    break
+                prices[i] = level.price
+                volumes[i] = level.total_volume
+                i += 1
+            prices[i:] = 0
+            volumes[i:] = 0
+
+        return out
+
+    def depth_to_volume(self, side: Side, volume: int) -> Tuple[int, int]:
+        """Return the volume available to an order on the given side for up to
+        the requested volume and the price of the worst level it would reach.
+        """
+        if side == Side.ASK:
+            total_volume, _, worst_price = self.__bids.sweep(volume, MINIMUM_BID)
+        else:
+            total_volume, _, worst_price = self.__asks.sweep(volume, MAXIMUM_ASK)
+        return total_volume, worst_price
+
     def insert(self, now: float, order: Order) -> None:
         """Insert a new order into this order book."""
-        if order.side == Side.SELL and self.__bid_prices and order.price <= self.__bid_prices[-1]:
+        if order.side == Side.SELL and self.__bids and order.price <= self.__bids.best_level().price:
             self.trade_ask(now, order)
-        elif order.side == Side.BUY and self.__ask_prices and order.price >= self.__ask_prices[-1]:
+        elif order.side == Side.BUY and self.__asks and order.price >= self.__asks.best_level().price:
             self.trade_bid(now, order)
 
         if order.remaining_volume > 0:
@@ -154,146 +918,250 @@ class OrderBook(object):
 
     def midpoint_price(self) -> Optional[float]:
         """Return the midpoint price."""
-        if self.__bid_prices and self.__ask_prices:
-            return (self.__bid_prices[-1] + -self.__ask_prices[-1]) / 2.0
-        return None
+        if self.__midpoint_version != self.version:
+            self.__midpoint_version = self.version
+            if self.__bids and self.__asks:
+                self.__midpoint_price = (self.__bids.best_level().price + self.__asks.best_level().price) / 2.0
+            else:
+                self.__midpoint_price = None
+        return self.__midpoint_price
 
     def place(self, now: float, order: Order) -> None:
         """Place an order that does not match any existing order in this order book."""
-        price = order.price
-
-        if price not in self.__levels:
-            self.__levels[price] = collections.deque()
-            self.__total_volumes[price] = 0
-            if order.side == Side.SELL:
-                insort_left(self.__ask_prices, -price)
-            else:
-                insort_left(self.__bid_prices, price)
+        ladder = self.__asks if order.side == Side.SELL else self.__bids
+        level = ladder.get_level(order.price)
+        if level is None:
+            level = ladder.add_level(order.price)
 
-        self.__levels[price].append(order)
-        self.__total_volumes[price] += order.remaining_volume
+        self.__sequence += 1
+        self.version += 1
+        order.sequence = self.__sequence
+        level.append(order)
+        ladder.adjust_volume(level, order.remaining_volume)
+        if self.__journal is not None:
+            self.__journal.record(order.side, level.price, level.total_volume)
 
         if order.listener:
             order.listener.on_order_placed(now, order)
 
-    def remove_volume_from_level(self, price: int, volume: int, side: Side) -> None:
-        if self.__total_volumes[price] == volume:
-            del self.__levels[price]
-            del self.__total_volumes[price]
-            if side == Side.SELL:
-                self.__ask_prices.pop(bisect(self.__ask_prices, -price) - 1)
-            elif side == Side.BUY:
-                self.__bid_prices.pop(bisect(self.__bid_prices, price) - 1)
-        else:
-            self.__total_volumes[price] -= volume
+    def queue_position(self, order: Order) -> Optional[int]:
+        """Return the volume ahead of a resting order at its price level, or
+        None if the order is not resting in this order book.
+
+        The first query for an order walks its price level once, after which
+        the queue position is maintained incrementally as volume ahead of the
+        order trades, is cancelled or is amended away.
+        """
+        if order.volume_ahead is not None:
+            return order.volume_ahead
+        if order.remaining_volume == 0 or order.sequence == 0:
+            return None
+        level = (self.__asks if order.side == Side.SELL else self.__bids).get_level(order.price)
+        return level.track(order) if level is not None else None
+
+    def remove_volume(self, order: Order, volume: int) -> None:
+        """Remove volume from a resting order, unlinking the order (and its level) if nothing remains."""
+        ladder = self.__asks if order.side == Side.SELL else self.__bids
+        level = ladder.get_level(order.price)
+        self.version += 1
+        ladder.adjust_volume(level, -volume)
+        if self.__journal is not None:
+            self.__journal.record(order.side, level.price, level.total_volume)
+        if order.remaining_volume == volume:
+            level.remove(order)
+        if level.total_volume == 0:
+            ladder.remove_level(level)
+        elif level.tracked_orders:
+            level.volume_removed(order, volume)
+
+    def restore(self, data: bytes, listener: Optional[IOrderListener] = None) -> List[Order]:
+        """Replace the state of this order book with a snapshot and return the restored orders.
+
+        The restored orders rest in their original price-time priority and
+        have the given listener. No listener callbacks are made.
+        """
+        version, last_traded_price, ask_tick_count, bid_tick_count, order_count = SNAPSHOT_HEADER.unpack_from(data)
+        if version != SNAPSHOT_VERSION:
+            raise ValueError("unsupported order book snapshot version: %d" % version)
+        start = SNAPSHOT_HEADER.size
+        middle = start + ask_tick_count * SNAPSHOT_TICK.size
+        end = middle + bid_tick_count * SNAPSHOT_TICK.size
+        if len(data) != end + order_count * SNAPSHOT_ORDER.size:
+            raise ValueError("order book snapshot has the wrong length: %d bytes" % len(data))
+
+        if self.__journal is not None:
+            for ladder in (self.__asks, self.__bids):
+                for level in ladder.levels():
+                    self.__journal.record(ladder.side, level.price, 0)
+
+        self.__asks = create_price_ladder(self.__ladder_type, Side.SELL, self.tick_size)
+        self.__bids = create_price_ladder(self.__ladder_type, Side.BUY, self.tick_size)
+        self.__ask_ticks.clear()
+        for price, volume in SNAPSHOT_TICK.iter_unpack(data[start:middle]):
+            self.__ask_ticks.add(price, volume)
+        self.__bid_ticks.clear()
+        for price, volume in SNAPSHOT_TICK.iter_unpack(data[middle:end]):
+            self.__bid_ticks.add(price, volume)
+        self.__last_traded_price = last_traded_price or None
+        self.__sequence = 0
+        self.__trade_pending = False
+        self.version += 1
+
+        orders: List[Order] = list()
+        for client_order_id, side, lifespan, price, volume, remaining, fees in SNAPSHOT_ORDER.iter_unpack(data[end:]):
+            order = Order(client_order_id, self.instrument, Lifespan(lifespan), Side(side), price, volume, listener)
+            order.remaining_volume = remaining
+            order.total_fees = fees
+            ladder = self.__asks if order.side == Side.SELL else self.__bids
+            level = ladder.get_level(price)
+            if level is None:
+                level = ladder.add_level(price)
+            self.__sequence += 1
+            order.sequence = self.__sequence
+            level.append(order)
+            ladder.adjust_volume(level, remaining)
+            orders.append(order)
+
+        if self.__journal is not None:
+            for ladder in (self.__asks, self.__bids):
+                for level in ladder.levels():
+                    self.__journal.record(ladder.side, level.price, level.total_volume)
+
+        return orders
+
+    def snapshot(self) -> bytes:
+        """Return a compact binary encoding of the state of this order book.
+
+        The snapshot holds every resting order in price-time priority, the
+        last traded price and the trade ticks not yet published. Listeners
+        are not included.
+        """
+        orders = [SNAPSHOT_ORDER.pack(order.client_order_id, order.side, order.lifespan, order.price, order.volume,
+                                      order.remaining_volume, order.total_fees)
+                  for ladder in (self.__asks, self.__bids) for level in ladder.levels() for order in level.orders()]
+        return b"".join((SNAPSHOT_HEADER.pack(SNAPSHOT_VERSION, self.__last_traded_price or 0, self.__ask_ticks.count,
+                                              self.__bid_ticks.count, len(orders)),
+                         b"".join(SNAPSHOT_TICK.pack(p, v) for p, v in self.__ask_ticks.items()),
+                         b"".join(SNAPSHOT_TICK.pack(p, v) for p, v in self.__bid_ticks.items()),
+                         b"".join(orders)))
 
     def top_levels(self, ask_prices: List[int], ask_volumes: List[int], bid_prices: List[int],
                    bid_volumes: List[int]) -> None:
         """Populate the supplied lists with the top levels for this book."""
-        i = 0
-        j = len(self.__ask_prices) - 1
-        while i < TOP_LEVEL_COUNT and j >= 0:
-            ask_prices[i] = -self.__ask_prices[j]
-            ask_volumes[i] = self.__total_volumes[ask_prices[i]]
-            i += 1
-            j -= 1
-        while i < TOP_LEVEL_COUNT:
-            ask_prices[i] = ask_volumes[i] = 0
-            i += 1
+        ask_prices[:], ask_volumes[:], bid_prices[:], bid_volumes[:] = self.top_levels_snapshot()
 
-        i = 0
-        j = len(self.__bid_prices) - 1
-        while i < TOP_LEVEL_COUNT and j >= 0:
-            bid_prices[i] = self.__bid_prices[j]
-            bid_volumes[i] = self.__total_volumes[bid_prices[i]]
-            i += 1
-            j -= 1
-        while i < TOP_LEVEL_COUNT:
-            bid_prices[i] = bid_volumes[i] = 0
-            i += 1
+    def top_levels_snapshot(self) -> Tuple[Tuple[int, ...], ...]:
+        """Return the ask prices, ask volumes, bid prices and bid volumes of the top levels for this book.
+
+        Each tuple has TOP_LEVEL_COUNT entries, padded with zeros. The snapshot
+        is only rebuilt when the book has changed since the last call.
+        """
+        if self.__top_levels_version != self.version:
+            self.__top_levels_version = self.version
+            snapshot = []
+            for ladder in (self.__asks, self.__bids):
+                prices = [0] * TOP_LEVEL_COUNT
+                volumes = [0] * TOP_LEVEL_COUNT
+                i = 0
+                for level in ladder.levels():
+                    prices[i] = level.price
+                    volumes[i] = level.total_volume
+                    i += 1
+                    if i == TOP_LEVEL_COUNT:
+                        break
+                snapshot.append(tuple(prices))
+                snapshot.append(tuple(volumes))
+            self.__top_levels = tuple(snapshot)
+        return self.__top_levels
 
     def trade_ask(self, now: float, order: Order) -> None:
         """Check to see if any existing bid orders match the specified ask order."""
-        best_bid = self.__bid_prices[-1]
-
-        while order.remaining_volume > 0 and best_bid >= order.price and self.__total_volumes[best_bid] > 0:
-            self.trade_level(now, order, best_bid)
-            if self.__total_volumes[best_bid] == 0:
-                del self.__levels[best_bid]
-                del self.__total_volumes[best_bid]
-                self.__bid_prices.pop()
-                if not self.__bid_prices:
-                    break
-                best_bid = self.__bid_prices[-1]
+        self.trade_ladder(now, order, self.__bids)
 
     def trade_bid(self, now: float, order: Order) -> None:
         """Check to see if any existing ask orders match the specified bid order."""
-        best_ask = -self.__ask_prices[-1]
-
-        while order.remaining_volume > 0 and best_ask <= order.price and self.__total_volumes[best_ask] > 0:
-            self.trade_level(now, order, best_ask)
-            if self.__total_volumes[best_ask] == 0:
-                del self.__levels[best_ask]
-                del self.__total_volumes[best_ask]
-                self.__ask_prices.pop()
-                if not self.__ask_prices:
-                    break
-                best_ask = -self.__ask_prices[-1]
+        self.trade_ladder(now, order, self.__asks)
+
+    def trade_ladder(self, now: float, order: Order, ladder: PriceLadder) -> None:
+        """Match the specified order with the best levels of the opposite side's ladder."""
+        best: Optional[PriceLevel] = ladder.best_level()
+        is_buy: bool = order.side == Side.BUY
+        level_count: int = 0
+        total_volume: int = 0
+        total_value: int = 0
 
-    def trade_level(self, now: float, order: Order, best_price: int) -> None:
-        """Match the specified order with existing orders at the given level."""
+        while (order.remaining_volume > 0 and best is not None
+               and (best.price <= order.price if is_buy else best.price >= order.price)
+               and best.total_volume > 0):
+            volume = self.trade_level(now, order, ladder, best)
+            level_count += 1
+            total_volume += volume
+            total_value += best.price * volume
+            if best.total_volume == 0:
+                ladder.remove_level(best)
+                best = ladder.best_level()
+
+        if self.__fills:
+            self.dispatch_fills(now)
+
+        if level_count:
+            if self.__signals_deferred:
+                self.__trade_pending = True
+            else:
+                for callback in self.trade_occurred:
+                    callback(self)
+            if self.order_traded:
+                summary = TradeSummary(order.side, level_count, total_volume, total_value, self.__last_traded_price)
+                for callback in self.order_traded:
+                    callback(self, summary)
+
+    def trade_level(self, now: float, order: Order, ladder: PriceLadder, level: PriceLevel) -> int:
+        """Match the specified order with existing orders at the given level and return the volume traded."""
+        best_price: int = level.price
         remaining: int = order.remaining_volume
-        order_queue: Deque[Order] = self.__levels[best_price]
-        total_volume: int = self.__total_volumes[best_price]
+        total_volume: int = level.total_volume
+        self.version += 1
 
         while remaining > 0 and total_volume > 0:
-            while order_queue[0].remaining_volume == 0:
-                order_queue.popleft()
-            passive: Order = order_queue[0]
+            passive: Order = level.first_order
             volume: int = remaining if remaining < passive.remaining_volume else passive.remaining_volume
             fee: int = round(best_price * volume * self.maker_fee)
             total_volume -= volume
             remaining -= volume
             passive.remaining_volume -= volume
             passive.total_fees += fee
+            if passive.remaining_volume == 0:
+                level.remove(passive)
+            if level.tracked_orders:
+                level.volume_removed(passive, volume)
             if passive.listener:
-                passive.listener.on_order_filled(now, passive, best_price, volume, fee)
+                self.__fills.append((passive, best_price, volume, fee))
 
-        self.__total_volumes[best_price] = total_volume
+        ladder.adjust_volume(level, total_volume - level.total_volume)
+        if self.__journal is not None:
+            self.__journal.record(Side.SELL if order.side == Side.BUY else Side.BUY, best_price, total_volume)
         traded_volume_at_this_level: int = order.remaining_volume - remaining
 
         if order.side == Side.BUY:
-            self.__ask_ticks[best_price] += traded_volume_at_this_level
+            self.__ask_ticks.add(best_price, traded_volume_at_this_level)
         else:
-            self.__bid_ticks[best_price] += traded_volume_at_this_level
+            self.__bid_ticks.add(best_price, traded_volume_at_this_level)
 
         fee: int = round(best_price * traded_volume_at_this_level * self.taker_fee)
         order.remaining_volume = remaining
         order.total_fees += fee
         if order.listener:
-            order.listener.on_order_filled(now, order, best_price, traded_volume_at_this_level, fee)
+            self.__fills.append((order, best_price, traded_volume_at_this_level, fee))
 
         self.__last_traded_price = best_price
-        for callback in self.trade_occurred:
-            callback(self)
+        return traded_volume_at_this_level
 
     def trade_ticks(self, ask_prices: List[int], ask_volumes: List[int], bid_prices: List[int],
                     bid_volumes: List[int]) -> bool:
         """Return True and populate the lists if there have been trades."""
-        if self.__ask_ticks or self.__bid_ticks:
-            prices = sorted(self.__ask_ticks.keys())[:TOP_LEVEL_COUNT]
-            volumes = tuple(self.__ask_ticks[p] for p in prices)
-            ask_prices[:] = prices + [0] * (TOP_LEVEL_COUNT - len(prices))
-            ask_volumes[:] = volumes + (0,) * (TOP_LEVEL_COUNT - len(volumes))
-
-            prices = sorted(self.__bid_ticks.keys(), reverse=True)[:TOP_LEVEL_COUNT]
-            volumes = tuple(self.__bid_ticks[p] for p in prices)
-            bid_prices[:] = prices + [0] * (TOP_LEVEL_COUNT - len(prices))
-            bid_volumes[:] = volumes + (0,) * (TOP_LEVEL_COUNT - len(volumes))
-
-            self.__ask_ticks.clear()
-            self.__bid_ticks.clear()
-
+        if self.__ask_ticks.count or self.__bid_ticks.count:
+            self.__ask_ticks.publish(ask_prices, ask_volumes)
+            self.__bid_ticks.publish(bid_prices, bid_volumes)
             return True
 
         return False
@@ -302,28 +1170,14 @@ class OrderBook(object):
         """Return the volume that would trade and the average price per lot for
         the requested trade without changing the order book.
         """
-        total_volume: int = 0
-        total_value: int = 0
+        if self.__trades_version != self.version:
+            self.__trades_version = self.version
+            self.__trades.clear()
 
-        if side == Side.ASK:
-            i = len(self.__bid_prices) - 1
-            while total_volume < volume and i >= 0 and self.__bid_prices[i] and self.__bid_prices[i] >= limit_price:
-                price: int = self.__bid_prices[i]
-                available: int = self.__total_volumes[price]
-                required: int = volume - total_volume
-                weight: int = required if required <= available else available
-                total_volume += weight
-                total_value += weight * price
-                i -= 1
-        else:
-            i = len(self.__ask_prices) - 1
-            while total_volume < volume and i >= 0 and -self.__ask_prices[i] and -self.__ask_prices[i] <= limit_price:
-                price: int = -self.__ask_prices[i]
-                available: int = self.__total_volumes[price]
-                required: int = volume - total_volume
-                weight: int = required if required <= available else available
-                total_volume += weight
-                total_value += weight * price
-                i -= 1
-
-        return total_volume, total_value // total_volume if total_volume > 0 else 0
+        key = (side, limit_price, volume)
+        result = self.__trades.get(key)
+        if result is None:
+            ladder = self.__bids if side == Side.ASK else self.__asks
+            total_volume, total_value, _ = ladder.sweep(volume, limit_price)
+            result = self.__trades[key] = (total_volume, total_value // total_volume if total_volume > 0 else 0)
+        return result
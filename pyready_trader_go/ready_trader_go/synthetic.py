@@ -0,0 +1,217 @@
+# Copyright 2021 Optiver Asia Pacific Pty. Ltd.
+#
+# This file is part of Ready Trader Go.
+#
+#     Ready Trader Go is free software: you can redistribute it and/or
+#     modify it under the terms of the GNU Affero General Public License
+#     as published by the Free Software Foundation, either version 3 of
+#     the License, or (at your option) any later version.
+#
+#     Ready Trader Go is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU Affero General Public License for more details.
+#
+#     You should have received a copy of the GNU Affero General Public
+#     License along with Ready Trader Go.  If not, see
+#     <https://www.gnu.org/licenses/>.
+import os
+
+from typing import Iterable, Iterator, List, Optional
+
+from .market_events import (BINARY_SUFFIX, COMPRESSED_OPENERS, INPUT_SCALING, MARKET_DATA_DTYPE, NO_VALUE,
+                            write_market_records)
+from .types import Instrument, Lifespan, MarketEventOperation, Side
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SYNTHETIC_WINDOW = 10.0  # Seconds of market data generated at a time
+CSV_HEADER = "Time,Instrument,Operation,OrderId,Side,Volume,Price,Lifespan\n"
+
+
+class OrderFlowModel(object):
+    """The parameters of a stochastic order flow for synthetic market data.
+
+    Orders arrive for each instrument as a Hawkes process with the given
+    base rate (per second), excitation (the mean number of orders triggered
+    by each order, zero for a Poisson process) and decay (per second). The
+    future's midpoint price follows a random walk and the ETF's midpoint
+    differs from it by a mean-reverting basis. Prices, volatilities and
+    offsets are in ticks.
+    """
+
+    def __init__(self, rate: float = 100.0, excitation: float = 0.0, decay: float = 10.0,
+                 cancel_ratio: float = 0.6, amend_ratio: float = 0.1, fak_ratio: float = 0.1,
+                 lifetime: float = 5.0, volatility: float = 0.1, basis_volatility: float = 0.5,
+                 basis_reversion: float = 1.0, depth: float = 3.0, mean_volume: float = 10.0,
+                 initial_price: int = 100, tick_size: int = 100):
+        """Initialise a new instance of the OrderFlowModel class."""
+        if rate <= 0.0 or decay <= 0.0 or lifetime <= 0.0 or depth < 1.0 or mean_volume < 1.0:
+            raise ValueError("rate, decay and lifetime must be positive and depth and mean volume at least one")
+        if not 0.0 <= excitation < 1.0:
+            raise ValueError("excitation must be at least zero and less than one")
+        if any(not 0.0 <= r <= 1.0 for r in (cancel_ratio, amend_ratio, fak_ratio)):
+            raise ValueError("cancel, amend and fill-and-kill ratios must be between zero and one")
+
+        self.amend_ratio: float = amend_ratio
+        self.basis_reversion: float = basis_reversion
+        self.basis_volatility: float = basis_volatility
+        self.cancel_ratio: float = cancel_ratio
+        self.decay: float = decay
+        self.depth: float = depth
+        self.excitation: float = excitation
+        self.fak_ratio: float = fak_ratio
+        self.initial_price: int = initial_price
+        self.lifetime: float = lifetime
+        self.mean_volume: float = mean_volume
+        self.rate: float = rate
+        self.tick_size: int = tick_size
+        self.volatility: float = volatility
+
+
+def __arrival_times(rng: "np.random.Generator", model: OrderFlowModel, start: float, end: float,
+                    carried: "np.ndarray", duration: float) -> List["np.ndarray"]:
+    """Return the order arrival times in a window and those triggered for later windows."""
+    immigrants = rng.uniform(start, end, rng.poisson(model.rate * (end - start)))
+    parents = np.concatenate((carried[carried < end], immigrants))
+    arrivals = [parents]
+    later = [carried[carried >= end]]
+    while model.excitation and len(parents):
+        children = np.repeat(parents, rng.poisson(model.excitation, len(parents)))
+        children += rng.exponential(1.0 / model.decay, len(children))
+        children = children[children < duration]
+        later.append(children[children >= end])
+        parents = children[children < end]
+        arrivals.append(parents)
+    return [np.sort(np.concatenate(arrivals)), np.concatenate(later)]
+
+
+def generate_market_data(model: OrderFlowModel, duration: float,
+                         seed: Optional[int] = None) -> Iterator["np.ndarray"]:
+    """Yield chunks of binary market data records for the given number of seconds of synthetic order flow.
+
+    The records are generated, and yielded in time order, SYNTHETIC_WINDOW
+    seconds at a time. Amends and cancels refer to earlier good-for-day
+    inserts and are carried over to the window in which they fall.
+    """
+    if np is None:
+        raise ImportError("synthetic market data requires the numpy package")
+
+    rng = np.random.default_rng(seed)
+    window = min(SYNTHETIC_WINDOW, 100.0 / model.basis_reversion) if model.basis_reversion > 0.0 else SYNTHETIC_WINDOW
+    carried = [np.empty(0) for _ in Instrument]
+    pending = np.empty(0, dtype=MARKET_DATA_DTYPE)
+    last_time, mid, basis = 0.0, float(model.initial_price), 0.0
+    next_order_id = 1
+
+    start = 0.0
+    while start < duration:
+        end = min(start + window, duration)
+
+        # Order arrivals for both instruments in time order
+        times, instruments = list(), list()
+        for instrument in Instrument:
+            arrivals, carried[instrument] = __arrival_times(rng, model, start, end, carried[instrument], duration)
+            times.append(arrivals)
+            instruments.append(np.full(len(arrivals), instrument, dtype=np.uint8))
+        times = np.concatenate(times)
+        order = np.argsort(times, kind="stable")
+        times, instruments = times[order], np.concatenate(instruments)[order]
+        count = len(times)
+
+        # Midpoint prices: a random walk for the future plus an Ornstein-Uhlenbeck basis for the ETF
+        elapsed = np.diff(times, prepend=last_time)
+        mids = mid + np.cumsum(rng.standard_normal(count) * model.volatility * np.sqrt(elapsed))
+        decay = np.exp(-model.basis_reversion * (times - last_time))
+        shocks = rng.standard_normal(count) * model.basis_volatility * np.sqrt(
+            -np.expm1(-2.0 * model.basis_reversion * elapsed))
+        bases = decay * (basis + np.cumsum(shocks / decay))
+        if count:
+            last_time, mid, basis = times[-1], mids[-1], bases[-1]
+        mids += np.where(instruments == Instrument.ETF, bases, 0.0)
+
+        # Inserts: passive good-for-day orders some ticks away from the midpoint, or aggressive fill-and-kill orders
+        inserts = np.empty(count, dtype=MARKET_DATA_DTYPE)
+        sides = rng.integers(0, 2, count, dtype=np.uint8)
+        signs = np.where(sides == Side.BUY, 1, -1)
+        fak = rng.random(count) < model.fak_ratio
+        offsets = rng.geometric(1.0 / model.depth, count) - 1
+        ticks = np.where(sides == Side.BUY, np.floor(mids), np.ceil(mids)) - signs * offsets
+        ticks[fak] = np.round(mids[fak]) + signs[fak] * (offsets[fak] + 1)
+        inserts["time"] = times
+        inserts["instrument"] = instruments
+        inserts["operation"] = MarketEventOperation.INSERT
+        inserts["order_id"] = np.arange(next_order_id, next_order_id + count)
+        inserts["side"] = sides
+        inserts["volume"] = rng.geometric(1.0 / model.mean_volume, count)
+        inserts["price"] = np.maximum(ticks, 1) * model.tick_size
+        inserts["lifespan"] = np.where(fak, Lifespan.FILL_AND_KILL, Lifespan.GOOD_FOR_DAY)
+        next_order_id += count
+
+        # Cancels and amends of good-for-day orders, which may fall in later windows
+        lifetimes = rng.exponential(model.lifetime, count)
+        cancelled = ~fak & (rng.random(count) < model.cancel_ratio)
+        amended = ~fak & (rng.random(count) < model.amend_ratio) & (inserts["volume"] > 1)
+        cancels = np.zeros(cancelled.sum(), dtype=MARKET_DATA_DTYPE)
+        cancels["time"] = times[cancelled] + lifetimes[cancelled]
+        cancels["operation"] = MarketEventOperation.CANCEL
+        amends = np.zeros(amended.sum(), dtype=MARKET_DATA_DTYPE)
+        amends["time"] = times[amended] + lifetimes[amended] * rng.random(len(amends))
+        amends["operation"] = MarketEventOperation.AMEND
+        amends["volume"] = -np.floor(rng.random(len(amends)) * (inserts["volume"][amended] - 1) + 1)
+        for records, mask in ((cancels, cancelled), (amends, amended)):
+            records["instrument"] = instruments[mask]
+            records["order_id"] = inserts["order_id"][mask]
+            records["side"] = records["lifespan"] = NO_VALUE
+        pending = np.concatenate((pending, cancels[cancels["time"] < duration], amends[amends["time"] < duration]))
+
+        # Times are rounded to microseconds, as in CSV files, so both formats hold the same market data
+        due = pending["time"] < end
+        records = np.concatenate((inserts, pending[due]))
+        pending = pending[~due]
+        records["time"] = np.round(records["time"], 6)
+        yield records[np.argsort(records["time"], kind="stable")]
+
+        start = end
+
+
+def write_market_data(chunks: Iterable["np.ndarray"], filename: str) -> int:
+    """Write chunks of binary market data records to a market data file and return the number of events.
+
+    Files with the BINARY_SUFFIX are written as binary market data files,
+    anything else as CSV, compressed if the file name has a suffix in
+    COMPRESSED_OPENERS.
+    """
+    if filename.endswith(BINARY_SUFFIX):
+        return write_market_records(chunks, filename)
+
+    sides = np.array(["A", "B", ""])  # Indexed by Side or NO_VALUE
+    lifespans = np.array(["F", "G", ""])  # Indexed by Lifespan or NO_VALUE
+    formats = ((MarketEventOperation.INSERT, "%.6f,%d,Insert,%d,%s,%d,%.2f,%s\n"),
+               (MarketEventOperation.AMEND, "%.6f,%d,Amend,%d,,%d,,\n"),
+               (MarketEventOperation.CANCEL, "%.6f,%d,Cancel,%d,,,,\n"))
+    opener = COMPRESSED_OPENERS.get(os.path.splitext(filename)[1], open)
+
+    count = 0
+    with opener(filename, "wt") as market_data:
+        market_data.write(CSV_HEADER)
+        for chunk in chunks:
+            # Format the rows for each operation a column at a time and then put them back in order
+            rows = np.empty(len(chunk), dtype=object)
+            for operation, fmt in formats:
+                mask = chunk["operation"] == operation
+                records = chunk[mask]
+                columns = [records["time"].tolist(), records["instrument"].tolist(), records["order_id"].tolist()]
+                if operation == MarketEventOperation.INSERT:
+                    columns += [sides[records["side"]].tolist(), records["volume"].tolist(),
+                                (records["price"] / INPUT_SCALING).tolist(), lifespans[records["lifespan"]].tolist()]
+                elif operation == MarketEventOperation.AMEND:
+                    columns.append(records["volume"].tolist())
+                rows[mask] = list(map(fmt.__mod__, zip(*columns)))
+            market_data.write("".join(rows.tolist()))
+            count += len(chunk)
+
+    return count
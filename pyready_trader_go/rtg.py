@@ -24,6 +24,9 @@ import time
 import traceback
 
 import ready_trader_go.exchange
+import ready_trader_go.market_events
+import ready_trader_go.market_profile
+import ready_trader_go.synthetic
 import ready_trader_go.trader
 
 try:
@@ -32,6 +35,61 @@ except ImportError:
     hud_main = hud_replay = None
 
 
+def convert(args) -> None:
+    """Convert a CSV market data file to a binary market data file."""
+    source: pathlib.Path = args.source
+    if not source.is_file():
+        print("'%s' is not a regular file" % str(source), file=sys.stderr)
+        return
+
+    destination: pathlib.Path = args.destination or source.with_suffix(ready_trader_go.market_events.BINARY_SUFFIX)
+    if destination.suffix != ready_trader_go.market_events.BINARY_SUFFIX:
+        print("'%s' does not have the '%s' suffix" % (str(destination), ready_trader_go.market_events.BINARY_SUFFIX),
+              file=sys.stderr)
+        return
+
+    try:
+        count = ready_trader_go.market_events.convert_market_data(str(source), str(destination))
+    except ImportError:
+        print("Cannot convert market data without the numpy module.", file=sys.stderr)
+    else:
+        print("converted %d market events from '%s' to '%s'" % (count, str(source), str(destination)))
+
+
+def profile_data(args) -> None:
+    """Profile the market events in a market data file."""
+    source: pathlib.Path = args.source
+    if not source.is_file():
+        print("'%s' is not a regular file" % str(source), file=sys.stderr)
+        return
+
+    try:
+        ready_trader_go.market_profile.write_profile(str(source), sys.stdout, args.interval, args.speed,
+                                                     args.rate_interval, args.throughput,
+                                                     None if args.no_depth else args.depth_interval)
+    except ImportError:
+        print("Cannot profile market data without the numpy module.", file=sys.stderr)
+
+
+def synth(args) -> None:
+    """Generate a synthetic market data file."""
+    try:
+        model = ready_trader_go.synthetic.OrderFlowModel(args.rate, args.excitation, args.decay, args.cancel_ratio,
+                                                         args.amend_ratio, args.fak_ratio, args.lifetime,
+                                                         args.volatility)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return
+
+    try:
+        count = ready_trader_go.synthetic.write_market_data(
+            ready_trader_go.synthetic.generate_market_data(model, args.duration, args.seed), str(args.destination))
+    except ImportError:
+        print("Cannot generate market data without the numpy module.", file=sys.stderr)
+    else:
+        print("generated %d market events in '%s'" % (count, str(args.destination)))
+
+
 def no_heads_up_display() -> None:
     print("Cannot run the Ready Trader Go heads-up display. This could\n"
           "mean that the PySide6 module has not been installed. Please\n"
@@ -70,27 +128,36 @@ def run(args) -> None:
             print("'%s': configuration file is missing: %s" % (auto_trader, auto_trader.with_suffix(".json")))
             return
 
-    with multiprocessing.Pool(len(args.autotrader) + 2, maxtasksperchild=1) as pool:
-        exchange = pool.apply_async(ready_trader_go.exchange.main,
-                                    error_callback=lambda e: on_error("The exchange simulator", e))
-
-        # Give the exchange simulator a chance to start up.
-        time.sleep(0.5)
-        
-        for path in args.autotrader:
-            if path.suffix.lower() == ".py":
-                pool.apply_async(ready_trader_go.trader.main, (path.with_suffix("").name,),
-                                 error_callback=lambda e: on_error("Auto-trader '%s'" % path, e))
+    # The exchange simulator does not run in the pool, whose worker processes are daemonic and so cannot start
+    # the process that parses market data when the "MarketDataProcess" setting is true.
+    exchange = multiprocessing.Process(target=ready_trader_go.exchange.main, name="exchange")
+    exchange.start()
+    try:
+        with multiprocessing.Pool(len(args.autotrader) + 1, maxtasksperchild=1) as pool:
+            # Give the exchange simulator a chance to start up.
+            time.sleep(0.5)
+
+            for path in args.autotrader:
+                if path.suffix.lower() == ".py":
+                    pool.apply_async(ready_trader_go.trader.main, (path.with_suffix("").name,),
+                                     error_callback=lambda e: on_error("Auto-trader '%s'" % path, e))
+                else:
+                    resolved: pathlib.Path = path.resolve()
+                    pool.apply_async(subprocess.run, ([resolved],), {"check": True, "cwd": resolved.parent},
+                                     error_callback=lambda e: on_error("Auto-trader '%s'" % path, e))
+
+            if hud_main is None:
+                no_heads_up_display()
+                exchange.join()
             else:
-                resolved: pathlib.Path = path.resolve()
-                pool.apply_async(subprocess.run, ([resolved],), {"check": True, "cwd": resolved.parent},
-                                 error_callback=lambda e: on_error("Auto-trader '%s'" % path, e))
+                hud_main(args.host, args.port)
+    finally:
+        if exchange.is_alive():
+            exchange.terminate()
+        exchange.join()
 
-        if hud_main is None:
-            no_heads_up_display()
-            exchange.get()
-        else:
-            hud_main(args.host, args.port)
+    if exchange.exitcode > 0:
+        print("The exchange simulator exited with code %d" % exchange.exitcode, file=sys.stderr)
 
 
 def main() -> None:
@@ -120,6 +187,68 @@ def main() -> None:
                                type=pathlib.Path)
     replay_parser.set_defaults(func=replay)
 
+    convert_parser = subparsers.add_parser("convert", aliases=["co"],
+                                           description="Convert a CSV market data file to the binary format.",
+                                           help="convert a CSV market data file to the binary format")
+    convert_parser.add_argument("source", type=pathlib.Path,
+                                help="name of the CSV market data file to convert")
+    convert_parser.add_argument("destination", nargs="?", type=pathlib.Path,
+                                help="name of the binary market data file (default is the source with a '%s' suffix)"
+                                     % ready_trader_go.market_events.BINARY_SUFFIX)
+    convert_parser.set_defaults(func=convert)
+
+    profile_parser = subparsers.add_parser("profile-data", aliases=["pr"],
+                                           description=("Report the event rates, bursts, order flow and book depth "
+                                                        "of a market data file and the load they put on the "
+                                                        "simulator."),
+                                           help="profile the market events in a market data file")
+    profile_parser.add_argument("source", type=pathlib.Path,
+                                help="name of the market data file to profile")
+    profile_parser.add_argument("--interval", default=0.05, type=float,
+                                help="the MarketEventInterval setting in seconds (default 0.05)")
+    profile_parser.add_argument("--speed", default=1.0, type=float,
+                                help="the Speed setting (default 1)")
+    profile_parser.add_argument("--throughput", type=float,
+                                help="number of market events the simulator can process per second, to find the "
+                                     "ticks where it would fall behind")
+    profile_parser.add_argument("--rate-interval", default=300.0, type=float,
+                                help="number of seconds over which event rates are reported (default 300)")
+    profile_parser.add_argument("--depth-interval", default=1.0, type=float,
+                                help="number of seconds between samples of the order books (default 1)")
+    profile_parser.add_argument("--no-depth", action="store_true",
+                                help="skip the book depth statistics, which need the order books to be replayed")
+    profile_parser.set_defaults(func=profile_data)
+
+    synth_parser = subparsers.add_parser("synth", aliases=["sy"],
+                                         description=("Generate a synthetic market data file from a stochastic "
+                                                      "order flow model."),
+                                         help="generate a synthetic market data file")
+    synth_parser.add_argument("destination", type=pathlib.Path,
+                              help="name of the market data file to generate; a '%s' suffix selects the binary format"
+                                   % ready_trader_go.market_events.BINARY_SUFFIX)
+    synth_parser.add_argument("--duration", default=3600.0, type=float,
+                              help="number of seconds of market data (default 3600)")
+    synth_parser.add_argument("--rate", default=100.0, type=float,
+                              help="base rate of orders per second for each instrument (default 100)")
+    synth_parser.add_argument("--excitation", default=0.0, type=float,
+                              help="mean number of orders triggered by each order, zero for Poisson arrivals "
+                                   "(default 0)")
+    synth_parser.add_argument("--decay", default=10.0, type=float,
+                              help="decay rate per second of the excitation (default 10)")
+    synth_parser.add_argument("--cancel-ratio", default=0.6, type=float,
+                              help="fraction of good-for-day orders that are cancelled (default 0.6)")
+    synth_parser.add_argument("--amend-ratio", default=0.1, type=float,
+                              help="fraction of good-for-day orders that are amended (default 0.1)")
+    synth_parser.add_argument("--fak-ratio", default=0.1, type=float,
+                              help="fraction of orders that are aggressive fill-and-kill orders (default 0.1)")
+    synth_parser.add_argument("--lifetime", default=5.0, type=float,
+                              help="mean number of seconds before an order is amended or cancelled (default 5)")
+    synth_parser.add_argument("--volatility", default=0.1, type=float,
+                              help="volatility of the midpoint price in ticks per root second (default 0.1)")
+    synth_parser.add_argument("--seed", type=int,
+                              help="seed for the random number generator, for reproducible market data")
+    synth_parser.set_defaults(func=synth)
+
     args = parser.parse_args()
     args.func(args)
 